@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+
+import argparse
+import grammar
+import regfix
+
+parser = argparse.ArgumentParser(
+    description='Fix the first line of every .in file, writing the matching .out file.')
+parser.add_argument('files', nargs='+', help='.in files')
+parser.add_argument('-j', '--workers', type=int, default=None,
+    help='number of worker processes (default: one per cpu)')
+args = parser.parse_args()
+
+def first_line(path:str) -> str :
+    with open(path) as f :
+        return f.readline().rstrip('\n')
+
+lines = map(first_line, args.files)
+for path, (fix, cost) in zip(args.files, regfix.correct_many(grammar.load(), lines, args.workers)) :
+    with open(path[:-3] + '.out', 'w') as f :
+        print(fix, cost, sep='\n', file=f)
@@ -0,0 +1,104 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+import regfix
+import grammar
+import rules
+from .corpus import generate
+
+parser = argparse.ArgumentParser(prog='python -m benchmark',
+    description='Measure RegFix on a synthetic typo corpus and on dataset-txt.')
+parser.add_argument('--samples', type=int, default=10, help='samples per command')
+parser.add_argument('--edits', type=int, default=2, help='maximal random edits per sample')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--max-cost', type=int, default=4)
+parser.add_argument('--astar', action='store_true', help='use the A* search mode')
+parser.add_argument('--dataset', default='dataset-txt', help='directory of .in files')
+parser.add_argument('--baseline', default=None, help='compare against this stored report')
+parser.add_argument('--save', default=None, help='store the report here')
+parser.add_argument('--tolerance', type=float, default=0.2,
+    help='relative slowdown reported as a regression')
+args = parser.parse_args()
+
+def percentile(values:List[float], q:float) -> float :
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def run(automaton, cases:Iterable[Tuple[str, str, int]]) -> Dict[str, dict] :
+    ''' Fix every (group, line, edits) case; edits is None if unknown. '''
+    latency, expanded, slowest = defaultdict(list), defaultdict(int), dict()
+    failures = []
+    for group, line, k in cases :
+        start = time.perf_counter()
+        fix = regfix.RegFix(automaton, line, args.max_cost, astar=args.astar)
+        fix.fix()
+        elapsed = time.perf_counter() - start
+        latency[group].append(elapsed)
+        expanded[group] += fix.expanded
+        if group not in slowest or slowest[group][0] < elapsed :
+            slowest[group] = elapsed, line
+
+        # the corrupted line is k edits away from a valid one
+        if k is not None and k <= args.max_cost and not 0 <= fix.cost <= k :
+            failures.append((group, line, k, fix.cost))
+
+    # tracing allocations is slow, so peak memory is taken from the slowest line only
+    memory = dict()
+    for group, (_, line) in slowest.items() :
+        tracemalloc.start()
+        regfix.RegFix(automaton, line, args.max_cost, astar=args.astar).fix()
+        memory[group] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    for group, line, k, cost in failures :
+        print(f'ORACLE FAILURE\t{group}\t{line!r}\t{k} edits\tcost {cost}', file=sys.stderr)
+    return {group : {
+        'count' : len(times),
+        'p50' : percentile(times, 0.50),
+        'p95' : percentile(times, 0.95),
+        'p99' : percentile(times, 0.99),
+        'expanded' : expanded[group] / len(times),
+        'peak_memory' : memory[group],
+    } for group, times in latency.items()}
+
+def dataset_cases(directory:str) -> Iterable[Tuple[str, str, int]] :
+    for path in sorted(glob.glob(os.path.join(directory, '*.in'))) :
+        with open(path) as f :
+            line = f.readline().rstrip('\n')
+        yield os.path.basename(path).split('-')[0], line, None
+
+def print_report(name:str, report:Dict[str, dict], baseline:Dict[str, dict]) :
+    print(f'== {name}')
+    print('command', 'count', 'p50 ms', 'p95 ms', 'p99 ms', 'expanded', 'peak KiB', sep='\t')
+    for group, r in sorted(report.items()) :
+        row = [group, r['count']] + ['%.2f' % (r[q] * 1000) for q in ('p50', 'p95', 'p99')]
+        row += ['%.0f' % r['expanded'], r['peak_memory'] // 1024]
+        old = baseline.get(group)
+        if old is not None and r['p95'] > old['p95'] * (1 + args.tolerance) :
+            row.append('REGRESSION p95 %.2f -> %.2f ms' % (old['p95'] * 1000, r['p95'] * 1000))
+        print(*row, sep='\t')
+
+baseline = dict()
+if args.baseline :
+    with open(args.baseline) as f :
+        baseline = json.load(f)
+
+automaton = grammar.load()
+corpus = ((name, corrupted, k) for name, _, corrupted, k in
+    generate(rules.rules, args.samples, args.edits, args.seed))
+reports = {'synthetic' : run(automaton, corpus)}
+if os.path.isdir(args.dataset) :
+    reports['dataset'] = run(automaton, dataset_cases(args.dataset))
+
+for name, report in reports.items() :
+    print_report(name, report, baseline.get(name, dict()))
+
+if args.save :
+    with open(args.save, 'w') as f :
+        json.dump(reports, f, indent=2)
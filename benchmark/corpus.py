@@ -0,0 +1,50 @@
+import random
+import string
+from typing import Iterator, List, Tuple
+from regfix.automaton import Automaton
+
+ALPHABET:str = string.ascii_letters + string.digits + ' -._'
+
+def sample(automaton:Automaton, rng:random.Random, length:int) -> str :
+    ''' A random string of the automaton's language, of about the given length. '''
+    chars, starts, ends, targets = automaton.chars, automaton.starts, automaton.ends, automaton.targets
+    members = automaton.members
+    least, _ = automaton.remaining
+    ret = []
+    s = rng.choice(automaton.initial)
+    while chars[s] >= 0 :
+        ret.append(chr(rng.choice(sorted(members[s]))))
+        follow = targets[starts[s]:ends[s]]
+        if len(ret) < length :
+            s = rng.choice(follow)
+        else :
+            # long enough: head for the terminator
+            shortest = min(least[t] for t in follow)
+            s = rng.choice([t for t in follow if least[t] == shortest])
+    return ''.join(ret)
+
+def mutate(s:str, k:int, rng:random.Random, alphabet:str=ALPHABET) -> str :
+    ''' Apply k random insertions, deletions and substitutions to s. '''
+    s = list(s)
+    for _ in range(k) :
+        op = rng.choice('ids' if s else 'i')
+        if op == 'i' :
+            s.insert(rng.randint(0, len(s)), rng.choice(alphabet))
+        elif op == 'd' :
+            del s[rng.randrange(len(s))]
+        else :
+            i = rng.randrange(len(s))
+            s[i] = rng.choice(alphabet.replace(s[i], ''))
+    return ''.join(s)
+
+def generate(commands:List['Command'], samples:int, edits:int, seed:int=0,
+        length:int=24) -> Iterator[Tuple[str, str, str, int]] :
+    ''' Yield (command name, valid line, corrupted line, edits) tuples,
+    samples of them per command. '''
+    rng = random.Random(seed)
+    for command in commands :
+        automaton = Automaton.from_regex(command.get_regex())
+        for _ in range(samples) :
+            valid = sample(automaton, rng, rng.randint(len(command.name), length))
+            k = rng.randint(0, edits)
+            yield command.name, valid, mutate(valid, k, rng), k
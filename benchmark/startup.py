@@ -0,0 +1,51 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+parser = argparse.ArgumentParser(prog='python -m benchmark.startup',
+    description='Measure the startup of a one-shot shellfix.py run.')
+parser.add_argument('--runs', type=int, default=5, help='runs, the fastest one counts')
+parser.add_argument('--line', default='sl', help='input line')
+parser.add_argument('--top', type=int, default=10, help='slowest top-level imports shown')
+parser.add_argument('--budget', type=float, default=None,
+    help='fail if a run takes longer than the bare interpreter by this many ms')
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def timed(argv:List[str], stdin:str='') -> Tuple[float, str] :
+    start = time.perf_counter()
+    proc = subprocess.run(argv, input=stdin, capture_output=True, text=True, cwd=_root, check=True)
+    return time.perf_counter() - start, proc.stderr
+
+def top_level_imports(importtime:str) -> List[Tuple[int, str]] :
+    ''' (cumulative us, module) of the imports done by the script itself,
+    parsed from -X importtime output. '''
+    ret = []
+    for line in importtime.splitlines() :
+        if not line.startswith('import time:') :
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit() and not name.startswith('  ') :
+            ret.append((int(cumulative), name.strip()))
+    return sorted(ret, reverse=True)
+
+if __name__ == '__main__' :
+    args = parser.parse_args()
+    command = [sys.executable, 'shellfix.py', '--no-server']
+    bare = min(timed([sys.executable, '-c', 'pass'])[0] for _ in range(args.runs))
+    wall = min(timed(command, args.line + '\n')[0] for _ in range(args.runs))
+    _, importtime = timed([sys.executable, '-X', 'importtime'] + command[1:], args.line + '\n')
+
+    print('interpreter ms', 'shellfix ms', 'overhead ms', sep='\t')
+    print('%.1f' % (bare * 1000), '%.1f' % (wall * 1000), '%.1f' % ((wall - bare) * 1000), sep='\t')
+    print()
+    print('import', 'cumulative ms', sep='\t')
+    for us, name in top_level_imports(importtime)[:args.top] :
+        print(name, '%.1f' % (us / 1000), sep='\t')
+
+    if args.budget is not None and (wall - bare) * 1000 > args.budget :
+        print('OVER BUDGET %.1f > %.1f ms' % ((wall - bare) * 1000, args.budget), file=sys.stderr)
+        exit(1)
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+import argparse
+import string
+import rules
+from regfix.dfa import DFA
+
+CHARSET = ''.join(sorted(set(string.printable) - set(string.whitespace) | {' '}))
+
+parser = argparse.ArgumentParser(description='Report DFA sizes of the rule grammar, '
+    'before and after minimization.')
+parser.parse_args()
+
+minimal = DFA(rules.get_regex(), CHARSET).minimize()
+print('reachable', minimal.original_size, sep='\t')
+print('minimal', len(minimal), sep='\t')
@@ -3,6 +3,8 @@ from typing import List
 import string
 from copy import deepcopy
 from regfix.regex import *
+if typing.TYPE_CHECKING :
+    from regfix.cfg import Grammar, Symbol
 
 WS = PositiveClosure(Leaf(' '))
 IDENTIFIER = PositiveClosure(Charset(string.ascii_letters + string.digits + '-'))
@@ -13,15 +15,29 @@ PATHS = PositiveClosure(Charset(string.ascii_letters + string.digits + '{}-_\.*'
 NUMBER = PositiveClosure(Charset(string.digits))
 
 class Argument :
-    def __init__(self, regex: typing.Union[str, Term], mult='1') :
+    def __init__(self, regex: typing.Union[str, Term], mult='1', exists=False) :
+        ''' exists marks arguments naming existing files ('dir': existing
+        directories), which a grammar may match against a file name oracle
+        instead of regex. '''
         assert mult in ['1', '?', '*', '+']
         if isinstance(regex, str) :
             if len(regex) and regex[0] == '<' and regex[-1] == '>':
                 regex = _predefined_regex_map[regex]
             else :
                 regex = Literal(regex)
-        self.regex = deepcopy(regex)
+        # the regex is copied, since building a RegEx updates its follow sets;
+        # grammars share the original term instead
+        self.term = regex
+        self._regex:Term = None
         self.mult = mult
+        self.exists = exists
+
+    @property
+    def regex(self) -> Term :
+        # copied on first use, so that importing the rules stays cheap
+        if self._regex is None :
+            self._regex = deepcopy(self.term)
+        return self._regex
 
 class Command :
     def __init__(self, name:str, positional:List[Argument]) :
@@ -43,3 +59,23 @@ class Command :
             terms.append(deepcopy(WS))
         terms[-1] = Optional(terms[-1])
         return RegEx(Concat(*terms))
+
+    def get_symbol(self, grammar:'Grammar', oracle=None) -> 'Symbol' :
+        ws = grammar.symbol(WS)
+        symbols = [grammar.opt(ws), grammar.literal(self.name), ws]
+        for arg in self.positional :
+            if arg.exists and oracle is not None :
+                sym = grammar.oracle(oracle.directories if arg.exists == 'dir' else oracle)
+            else :
+                sym = grammar.symbol(arg.term)
+            mult = arg.mult
+            if mult == '?' :
+                sym = grammar.opt(sym)
+            elif mult == '*' :
+                sym = grammar.star(sym)
+            elif mult == '+' :
+                sym = grammar.plus(sym)
+            symbols.append(sym)
+            symbols.append(ws)
+        symbols[-1] = grammar.opt(symbols[-1])
+        return grammar.seq(*symbols)
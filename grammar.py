@@ -0,0 +1,22 @@
+import os
+import regfix.automaton
+import regfix.dispatch
+
+_here = os.path.dirname(os.path.abspath(__file__))
+
+def fingerprint() -> str :
+    # changes whenever a rule definition or the compiler changes
+    return regfix.automaton.fingerprint(os.path.join(_here, 'rules.py'), os.path.join(_here, 'dsl.py'))
+
+def load() -> regfix.automaton.Automaton :
+    # the compiled grammar is cached on disk, keyed by the rule definitions
+    key = fingerprint()
+    def build() :
+        import rules
+        return rules.get_regex()
+    return regfix.automaton.load_cached(key, build)
+
+def load_index() -> regfix.dispatch.CommandIndex :
+    # per-command automata are compiled on first use
+    import rules
+    return rules.get_index()
@@ -1 +1,2 @@
-from .regfix import RegFix
\ No newline at end of file
+from .regfix import RegFix, SearchStats, correct
+from .batch import correct_many
\ No newline at end of file
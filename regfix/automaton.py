@@ -0,0 +1,241 @@
+import hashlib
+import mmap
+import os
+import struct
+import weakref
+from array import array
+from typing import Callable, Dict, FrozenSet, Iterable, List, Tuple, Union
+from . import regex as _regex
+from .regex import RegEx, Leaf
+
+FORMAT_VERSION:int = 3
+
+_UNBOUNDED:int = 2**31 - 1
+
+# header: magic, version, #positions, #follow targets, #initial positions,
+# #character classes, #class members
+_HEADER = struct.Struct('=4sIIIIII')
+_MAGIC = b'RGFX'
+
+class Automaton :
+    ''' Position automaton of a RegEx flattened into integer arrays.
+
+    Position i stands for a leaf: chars[i] is its code point (-1 for the
+    terminator), and its follow set is targets[starts[i]:ends[i]]. Positions
+    with the same follow set share one range of targets. initial holds the
+    positions of the regex's first set.
+
+    A character class position has classes[i] >= 0, and matches the code
+    points class_members[class_offsets[c]:class_offsets[c+1]] of class c;
+    chars[i] is then the least of them. Other positions have classes[i] == -1.
+    '''
+    def __init__(self, chars:Iterable[int], starts:Iterable[int], ends:Iterable[int],
+            targets:Iterable[int], initial:Iterable[int], classes:Iterable[int]=None,
+            class_offsets:Iterable[int]=(0,), class_members:Iterable[int]=()) :
+        self.chars = chars
+        self.starts = starts
+        self.ends = ends
+        self.targets = targets
+        self.initial = initial
+        self.classes = classes if classes is not None else array('i', [-1] * len(chars))
+        self.class_offsets = class_offsets
+        self.class_members = class_members
+        self._accepts:bytes = None
+        self._members:List[FrozenSet[int]] = None
+        self._remaining:Tuple[List[int], List[int]] = None
+
+    def __len__(self) -> int :
+        return len(self.chars)
+
+    @property
+    def accepts(self) -> bytes :
+        # accepts[i] is 1 iff position i is the terminator
+        if self._accepts is None :
+            self._accepts = bytes(int(ch < 0) for ch in self.chars)
+        return self._accepts
+
+    @property
+    def members(self) -> List[FrozenSet[int]] :
+        ''' members[i] is the set of code points position i matches. '''
+        if self._members is None :
+            offsets, members = self.class_offsets, self.class_members
+            sets = [frozenset(members[offsets[c]:offsets[c+1]]) for c in range(len(offsets) - 1)]
+            self._members = [sets[c] if c >= 0 else frozenset([ch] if ch >= 0 else [])
+                for ch, c in zip(self.chars, self.classes)]
+        return self._members
+
+    def matches(self, s:str) -> bool :
+        ''' Whether s is in the language, by running the automaton over it. '''
+        members, starts, ends, targets = self.members, self.starts, self.ends, self.targets
+        states = set(self.initial)
+        for ch in map(ord, s) :
+            nxt = set()
+            for t in states :
+                if ch in members[t] :
+                    nxt.update(targets[starts[t]:ends[t]])
+            if not nxt :
+                return False
+            states = nxt
+        accepts = self.accepts
+        return any(accepts[t] for t in states)
+
+    @property
+    def remaining(self) -> Tuple[List[int], List[int]] :
+        ''' The fewest and the most characters emitted from each position on
+        before reaching the terminator (_UNBOUNDED if there is no such limit). '''
+        if self._remaining is None :
+            n, chars, starts, ends, targets = len(self), self.chars, self.starts, self.ends, self.targets
+            preceding:List[List[int]] = [[] for _ in range(n)]
+            for s in range(n) :
+                for t in targets[starts[s]:ends[s]] :
+                    preceding[t].append(s)
+            terminators = [s for s in range(n) if chars[s] < 0]
+
+            # fewest: BFS backwards from the terminators
+            least = [_UNBOUNDED] * n
+            for s in terminators :
+                least[s] = 0
+            queue = list(terminators)
+            for t in queue :
+                for s in preceding[t] :
+                    if least[s] == _UNBOUNDED :
+                        least[s] = least[t] + 1
+                        queue.append(s)
+
+            # most: longest paths, settled once all successors are; positions
+            # on or before a cycle are never settled
+            most = [_UNBOUNDED] * n
+            pending = [ends[s] - starts[s] for s in range(n)]
+            for s in terminators :
+                most[s] = 0
+            queue = list(terminators)
+            for t in queue :
+                for s in preceding[t] :
+                    pending[s] -= 1
+                    if not pending[s] :
+                        most[s] = 1 + max(most[u] for u in targets[starts[s]:ends[s]])
+                        queue.append(s)
+            self._remaining = least, most
+        return self._remaining
+
+    @staticmethod
+    def of(regex:Union[RegEx, 'Automaton']) -> 'Automaton' :
+        ''' The automaton of regex, converted once per RegEx object. '''
+        if isinstance(regex, Automaton) :
+            return regex
+        automaton = _converted.get(regex)
+        if automaton is None :
+            automaton = _converted[regex] = Automaton.from_regex(regex)
+        return automaton
+
+    @staticmethod
+    def from_regex(regex:RegEx) -> 'Automaton' :
+        assert isinstance(regex, RegEx)
+        index:Dict[Leaf, int] = dict()
+        order:List[Leaf] = []
+        stack:List[Leaf] = []
+
+        def visit(leaf:Leaf) :
+            if leaf not in index :
+                index[leaf] = len(order)
+                order.append(leaf)
+                stack.append(leaf)
+
+        for leaf in regex.term.first :
+            visit(leaf)
+        # leaves sharing a follow chain lead to the same leaves
+        walked = set()
+        while stack :
+            leaf = stack.pop()
+            if leaf.follow_chain not in walked :
+                walked.add(leaf.follow_chain)
+                for f in leaf.follow :
+                    visit(f)
+
+        chars, starts, ends, targets = array('i'), array('i'), array('i'), array('i')
+        classes, class_offsets, class_members = array('i'), array('i', [0]), array('i')
+        class_ids:Dict[FrozenSet[str], int] = dict()
+        ranges:Dict[object, Tuple[int, int]] = dict()
+        for leaf in order :
+            chars.append(-1 if leaf.is_terminator else ord(leaf.char))
+            if len(leaf.chars) > 1 :
+                if leaf.chars not in class_ids :
+                    class_ids[leaf.chars] = len(class_ids)
+                    class_members.extend(sorted(map(ord, leaf.chars)))
+                    class_offsets.append(len(class_members))
+                classes.append(class_ids[leaf.chars])
+            else :
+                classes.append(-1)
+            # leaves with the same follow chain have the same follow set
+            if leaf.follow_chain not in ranges :
+                start = len(targets)
+                targets.extend(sorted(index[f] for f in leaf.follow))
+                ranges[leaf.follow_chain] = start, len(targets)
+            start, end = ranges[leaf.follow_chain]
+            starts.append(start)
+            ends.append(end)
+        initial = array('i', sorted(index[leaf] for leaf in regex.term.first))
+        return Automaton(chars, starts, ends, targets, initial,
+            classes, class_offsets, class_members)
+
+    def save(self, path:str) :
+        # write to a temporary file first, so that readers never see a partial file
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f :
+            f.write(_HEADER.pack(_MAGIC, FORMAT_VERSION,
+                len(self.chars), len(self.targets), len(self.initial),
+                len(self.class_offsets) - 1, len(self.class_members)))
+            for arr in (self.chars, self.starts, self.ends, self.targets, self.initial,
+                    self.classes, self.class_offsets, self.class_members) :
+                f.write(array('i', arr).tobytes())
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path:str) -> 'Automaton' :
+        ''' Map a saved automaton read-only; processes loading the same file
+        share its pages. '''
+        with open(path, 'rb') as f :
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n, m, k, c, cm = _HEADER.unpack_from(buf)
+        if magic != _MAGIC or version != FORMAT_VERSION :
+            raise ValueError(f'{path}: not a compiled automaton of version {FORMAT_VERSION}')
+        view = memoryview(buf)[_HEADER.size:]
+        arrays = []
+        for length in (n, n, n, m, k, n, c + 1, cm) :
+            size = length * 4
+            arrays.append(view[:size].cast('i'))
+            view = view[size:]
+        return Automaton(*arrays)
+
+_converted:'weakref.WeakKeyDictionary[RegEx, Automaton]' = weakref.WeakKeyDictionary()
+
+def fingerprint(*paths:str) -> str :
+    ''' Hash the given source files together with the regex construction
+    code and the artifact format. '''
+    h = hashlib.sha256(str(FORMAT_VERSION).encode())
+    for path in (_regex.__file__, __file__) + paths :
+        with open(path, 'rb') as f :
+            h.update(f.read())
+    return h.hexdigest()
+
+def default_cache_dir() -> str :
+    return os.environ.get('REGFIX_CACHE',
+        os.path.join(os.path.expanduser('~'), '.cache', 'regfix'))
+
+def load_cached(key:str, build:Callable[[], RegEx], cache_dir:str=None) -> Automaton :
+    ''' Load the automaton stored under key, compiling it with build() and
+    saving it first if it is not cached yet. Saving one removes the other
+    artifacts in cache_dir, which were stored under keys now outdated. '''
+    cache_dir = cache_dir or default_cache_dir()
+    path = os.path.join(cache_dir, f'{key}.rgfx')
+    if not os.path.exists(path) :
+        os.makedirs(cache_dir, exist_ok=True)
+        Automaton.from_regex(build()).save(path)
+        for name in os.listdir(cache_dir) :
+            if name.endswith('.rgfx') and name != f'{key}.rgfx' :
+                # processes still mapping it keep their pages
+                try :
+                    os.unlink(os.path.join(cache_dir, name))
+                except FileNotFoundError :
+                    pass
+    return Automaton.load(path)
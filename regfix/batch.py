@@ -0,0 +1,67 @@
+import os
+from collections import deque
+from itertools import islice
+from typing import TYPE_CHECKING, Deque, Iterable, Iterator, List, Optional, Tuple, Union
+from .regex import RegEx
+from .automaton import Automaton
+from .regfix import correct
+if TYPE_CHECKING :
+    from concurrent.futures import ProcessPoolExecutor
+
+# the grammar of a worker process, set once by _init_worker
+_grammar:Automaton = None
+
+def _init_worker(grammar:Automaton) :
+    global _grammar
+    _grammar = grammar
+
+def _correct_chunk(chunk:List[str], max_cost:int) -> List[Tuple[Optional[str], int]] :
+    ret = []
+    for line in chunk :
+        ret.append(correct(_grammar, line, max_cost))
+    return ret
+
+def correct_many(grammar:Union[RegEx, Automaton], lines:Iterable[str], workers:int=None,
+        max_cost:int=4, chunksize:int=16) -> Iterator[Tuple[Optional[str], int]] :
+    ''' Fix every line, yielding (fix, cost) pairs in input order.
+
+    The grammar is compiled once; worker processes are forked from this one
+    and inherit it. Only a few chunks per worker are in flight at a time, so
+    lines may be an arbitrarily long stream.
+    '''
+    grammar = Automaton.of(grammar)
+    workers = workers or os.cpu_count()
+    lines = iter(lines)
+    if workers == 1 :
+        _init_worker(grammar)
+        while True :
+            chunk = list(islice(lines, chunksize))
+            if not chunk :
+                return
+            yield from _correct_chunk(chunk, max_cost)
+
+    # imported here, they slow down the startup of single-line tools
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(workers, context, _init_worker, (grammar,)) as executor :
+        pending:Deque = deque()
+        while True :
+            while len(pending) < 4 * workers :
+                chunk = list(islice(lines, chunksize))
+                if not chunk :
+                    break
+                pending.append(executor.submit(_correct_chunk, chunk, max_cost))
+            if not pending :
+                return
+            yield from pending.popleft().result()
+
+def worker_pool(grammar:Union[RegEx, Automaton], workers:int=None) -> 'ProcessPoolExecutor' :
+    ''' A long-lived pool of processes forked with the compiled grammar,
+    running _correct_chunk; forking one per call costs more than fixing a
+    few short lines. '''
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    context = multiprocessing.get_context('fork')
+    return ProcessPoolExecutor(workers or os.cpu_count(), context, _init_worker,
+        (Automaton.of(grammar),))
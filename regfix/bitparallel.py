@@ -0,0 +1,115 @@
+import weakref
+from typing import Dict, List, Union
+from .regex import RegEx
+from .automaton import Automaton
+
+class BitParallel :
+    ''' Cost-only approximate matching over the positions of an automaton.
+
+    The set of positions reachable with at most k edits is kept as a big-int
+    bitmask for every k <= max_cost, and the input is consumed one character
+    at a time (Wu-Manber style, over Glushkov positions).
+
+    Follow sets of masks are read from per-byte lookup tables, and the
+    recent ones are remembered, as the same masks keep coming back.
+    '''
+    MEMO_SIZE:int = 1 << 16
+
+    def __init__(self, regex:Union[RegEx, Automaton]) :
+        automaton = Automaton.of(regex)
+        starts, ends, targets = automaton.starts, automaton.ends, automaton.targets
+
+        # positions matching each character
+        self.masks:Dict[int, int] = dict()
+        for i, members in enumerate(automaton.members) :
+            for ch in members :
+                self.masks[ch] = self.masks.get(ch, 0) | 1 << i
+
+        follows = []
+        for i in range(len(automaton)) :
+            follow = 0
+            for t in targets[starts[i]:ends[i]] :
+                follow |= 1 << t
+            follows.append(follow)
+        follows.extend([0] * (-len(follows) % 8))
+
+        # table[256 * c + b] is the union of the follow sets of the positions
+        # 8 * c + j for the bits j set in b
+        self.bytes:int = len(follows) // 8
+        self.table:List[int] = []
+        for c in range(self.bytes) :
+            row = [0]
+            for b in range(1, 256) :
+                low = b & -b
+                row.append(row[b ^ low] | follows[8 * c + low.bit_length() - 1])
+            self.table.extend(row)
+        self._memo:Dict[int, int] = dict()
+
+        self.initial:int = 0
+        for i in automaton.initial :
+            self.initial |= 1 << i
+        self.accepts:int = 0
+        for i, accepting in enumerate(automaton.accepts) :
+            if accepting :
+                self.accepts |= 1 << i
+
+    @staticmethod
+    def of(regex:Union[RegEx, Automaton]) -> 'BitParallel' :
+        ''' The matcher of regex, built once per automaton. '''
+        automaton = Automaton.of(regex)
+        ret = _built.get(automaton)
+        if ret is None :
+            ret = _built[automaton] = BitParallel(automaton)
+        return ret
+
+    def follow(self, mask:int) -> int :
+        ret = self._memo.get(mask)
+        if ret is None :
+            ret = 0
+            table = self.table
+            for base, b in enumerate(mask.to_bytes(self.bytes, 'little')) :
+                if b :
+                    ret |= table[base << 8 | b]
+            if len(self._memo) >= self.MEMO_SIZE :
+                self._memo.clear()
+            self._memo[mask] = ret
+        return ret
+
+    def cost(self, errstr:str, max_cost:int=4) -> int :
+        ''' The minimal edit cost of errstr, or -1 if it exceeds max_cost.
+        >>> from itertools import product
+        >>> from regfix.regex import *
+        >>> from regfix.regfix import RegFix
+        >>> regex = RegEx(Concat(KleeneClosure(Union(Literal('ab'), Charset('bc'))), Literal('a')))
+        >>> matcher = BitParallel(regex)
+        >>> all(matcher.cost(s, 3) == RegFix(regex, s, 3).cost
+        ...     for n in range(6) for s in map(''.join, product('abcd', repeat=n)))
+        True
+        '''
+        follow, masks = self.follow, self.masks
+
+        # layer[k]: positions reachable with at most k edits (inserts included)
+        layer = [self.initial]
+        for k in range(max_cost) :
+            layer.append(layer[k] | follow(layer[k]))
+
+        for ch in errstr :
+            mask = masks.get(ord(ch), 0)
+            # match
+            entered = follow(layer[0] & mask)
+            nxt = [entered]
+            for k in range(1, max_cost + 1) :
+                prev = layer[k - 1]
+                # match at level k, substitute from k-1, delete from k-1, insert
+                entered = follow(layer[k] & mask | prev) | prev | nxt[k - 1]
+                nxt.append(entered | follow(nxt[k - 1]))
+            layer = nxt
+            if not layer[max_cost] :
+                return -1
+
+        for k in range(max_cost + 1) :
+            if layer[k] & self.accepts :
+                return k
+        return -1
+
+_built:'weakref.WeakKeyDictionary[Automaton, BitParallel]' = weakref.WeakKeyDictionary()
@@ -0,0 +1,97 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+Result = Tuple[Optional[str], int]
+
+# rough bookkeeping cost of one cached entry besides its strings
+_ENTRY_OVERHEAD:int = 200
+
+class FixCache :
+    ''' Fix results of one grammar, by (errstr, max_cost).
+
+    The first tier is an in-process LRU holding at most max_bytes (counted
+    roughly); the optional second tier is an SQLite file. key identifies the
+    grammar, e.g. the fingerprint of its rules; rows stored under any other
+    key are dropped when the file is opened, so changing a rule invalidates
+    them. The cache may be shared between threads.
+    '''
+    def __init__(self, key:str, max_bytes:int=16 << 20, path:str=None) :
+        self.key = key
+        self.max_bytes = max_bytes
+        self.size:int = 0
+        self.hits:int = 0
+        self.disk_hits:int = 0
+        self.misses:int = 0
+        self._entries:'OrderedDict[Tuple[str, int], Result]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db:Optional[sqlite3.Connection] = None
+        if path is not None :
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db :
+                self._db.execute('CREATE TABLE IF NOT EXISTS fixes (grammar TEXT, errstr TEXT, '
+                    'max_cost INTEGER, fix TEXT, cost INTEGER, PRIMARY KEY (grammar, errstr, max_cost))')
+                self._db.execute('DELETE FROM fixes WHERE grammar != ?', (key,))
+
+    def get(self, errstr:str, max_cost:int) -> Optional[Result] :
+        with self._lock :
+            result = self._entries.get((errstr, max_cost))
+            if result is not None :
+                self._entries.move_to_end((errstr, max_cost))
+                self.hits += 1
+                return result
+            if self._db is not None :
+                row = self._db.execute('SELECT fix, cost FROM fixes WHERE grammar = ? '
+                    'AND errstr = ? AND max_cost = ?', (self.key, errstr, max_cost)).fetchone()
+                if row is not None :
+                    self.disk_hits += 1
+                    self._remember(errstr, max_cost, tuple(row))
+                    return tuple(row)
+            self.misses += 1
+            return None
+
+    def put(self, errstr:str, max_cost:int, result:Result) :
+        with self._lock :
+            self._remember(errstr, max_cost, result)
+            if self._db is not None :
+                with self._db :
+                    self._db.execute('INSERT OR REPLACE INTO fixes VALUES (?, ?, ?, ?, ?)',
+                        (self.key, errstr, max_cost) + tuple(result))
+
+    def lookup(self, errstr:str, max_cost:int, compute:Callable[[], Result]) -> Result :
+        ''' The cached result, or compute() stored in both tiers. '''
+        result = self.get(errstr, max_cost)
+        if result is None :
+            result = compute()
+            self.put(errstr, max_cost, result)
+        return result
+
+    def _remember(self, errstr:str, max_cost:int, result:Result) :
+        if (errstr, max_cost) in self._entries :
+            return
+        self._entries[errstr, max_cost] = result
+        self.size += _size(errstr, result)
+        while self.size > self.max_bytes and self._entries :
+            (old, _), evicted = self._entries.popitem(last=False)
+            self.size -= _size(old, evicted)
+
+    def __len__(self) -> int :
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float :
+        lookups = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float] :
+        return {'hits' : self.hits, 'disk_hits' : self.disk_hits, 'misses' : self.misses,
+            'hit_rate' : self.hit_rate, 'entries' : len(self), 'bytes' : self.size}
+
+    def close(self) :
+        if self._db is not None :
+            self._db.close()
+            self._db = None
+
+def _size(errstr:str, result:Result) -> int :
+    return _ENTRY_OVERHEAD + len(errstr) + len(result[0] or '')
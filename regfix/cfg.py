@@ -0,0 +1,322 @@
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from .names import NameTrie
+from .regex import Term, Leaf, Empty, Concat, Union, KleeneClosure, PositiveClosure
+from .regex import Optional as _Optional
+
+# Grammar symbols. A symbol may be used by many others; each one is a single
+# nonterminal of the grammar, no matter how many commands refer to it.
+
+class Symbol :
+    pass
+
+class Chars(Symbol) :
+    def __init__(self, chars:FrozenSet[str]) :
+        assert len(chars)
+        self.chars = frozenset(chars)
+        self.char = min(self.chars)
+
+class Nothing(Symbol) :
+    pass
+
+class Seq(Symbol) :
+    def __init__(self, *children:Symbol) :
+        self.children:List[Symbol] = list(children)
+
+class Alt(Symbol) :
+    def __init__(self, *children:Symbol) :
+        self.children:List[Symbol] = list(children)
+
+class Star(Symbol) :
+    def __init__(self, child:Symbol) :
+        self.child = child
+
+class Oracle(Symbol) :
+    ''' A terminal matched by an outside oracle rather than by rules, e.g.
+    the names of existing files. oracle.cells(errstr, l, bound) maps r to
+    the cost (at most bound) of editing errstr[l:r] into one of its strings,
+    and oracle.build(errstr, l, r, cost) returns such a string. '''
+    def __init__(self, oracle) :
+        self.oracle = oracle
+
+class Grammar :
+    ''' A context-free grammar built from regex Terms and shared pieces.
+
+    Terms converted with symbol() are memoized by identity, so a Term
+    referenced by several rules (e.g. a file name) becomes one nonterminal.
+    Alternatives of the start symbol may be added with the name of the
+    command they start with; only those close enough to a line are searched.
+    '''
+    def __init__(self) :
+        self.start:Symbol = Alt()
+        self.nothing:Symbol = Nothing()
+        self.trie = NameTrie()
+        self._unnamed:List[int] = []
+        # keep the source objects alive, their ids are the keys
+        self._terms:Dict[int, Tuple[Term, Symbol]] = dict()
+        self._derived:Dict[Tuple[str, int], Symbol] = dict()
+        self._literals:Dict[str, Symbol] = dict()
+
+    def add(self, symbol:Symbol, name:Optional[str]=None) :
+        if name is None :
+            self._unnamed.append(len(self.start.children))
+        else :
+            self.trie.add(name, len(self.start.children))
+        self.start.children.append(symbol)
+
+    def bounds(self, errstr:str, max_cost:int) -> Dict[int, int] :
+        ''' A lower bound on the cost of each alternative of the start
+        symbol that may be within max_cost of errstr; see NameTrie.bounds. '''
+        ret = self.trie.bounds(errstr, max_cost)
+        for i in self._unnamed :
+            ret[i] = 0
+        return ret
+
+    @property
+    def size(self) -> int :
+        ''' Number of symbols plus number of references between them. '''
+        seen = set()
+        stack = [self.start]
+        size = 0
+        while stack :
+            sym = stack.pop()
+            if sym in seen :
+                continue
+            seen.add(sym)
+            children = _children(sym)
+            size += 1 + len(children)
+            stack.extend(children)
+        return size
+
+    def symbol(self, term:Term) -> Symbol :
+        if id(term) not in self._terms :
+            self._terms[id(term)] = term, self._convert(term)
+        return self._terms[id(term)][1]
+
+    def _convert(self, term:Term) -> Symbol :
+        if isinstance(term, Leaf) :
+            return Chars(term.chars)
+        if isinstance(term, Empty) :
+            return self.nothing
+        if isinstance(term, _Optional) :
+            return self.opt(self.symbol(term.term))
+        if isinstance(term, Concat) :
+            return Seq(*map(self.symbol, term.terms))
+        if isinstance(term, Union) :
+            children = list(map(self.symbol, term.terms))
+            if all(isinstance(child, Chars) for child in children) :
+                return Chars(frozenset().union(*(child.chars for child in children)))
+            return Alt(*children)
+        if isinstance(term, KleeneClosure) :
+            return self.star(self.symbol(term.term))
+        if isinstance(term, PositiveClosure) :
+            return self.plus(self.symbol(term.term))
+        raise TypeError(f'cannot convert {type(term).__name__} to a grammar symbol')
+
+    def _derive(self, kind:str, symbol:Symbol, build) -> Symbol :
+        key = kind, id(symbol)
+        if key not in self._derived :
+            self._derived[key] = build()
+        return self._derived[key]
+
+    def opt(self, symbol:Symbol) -> Symbol :
+        return self._derive('?', symbol, lambda : Alt(self.nothing, symbol))
+
+    def star(self, symbol:Symbol) -> Symbol :
+        return self._derive('*', symbol, lambda : Star(symbol))
+
+    def plus(self, symbol:Symbol) -> Symbol :
+        return self._derive('+', symbol, lambda : Seq(symbol, self.star(symbol)))
+
+    def seq(self, *symbols:Symbol) -> Symbol :
+        return Seq(*symbols)
+
+    def oracle(self, oracle) -> Symbol :
+        return self._derive('oracle', oracle, lambda : Oracle(oracle))
+
+    def literal(self, s:str) -> Symbol :
+        if s not in self._literals :
+            self._literals[s] = Seq(*(Chars(frozenset(ch)) for ch in s))
+        return self._literals[s]
+
+def _children(sym:Symbol) -> List[Symbol] :
+    if isinstance(sym, (Seq, Alt)) :
+        return sym.children
+    if isinstance(sym, Star) :
+        return [sym.child]
+    return []
+
+class CFGFix :
+    ''' Fix errstr against a Grammar by interval dynamic programming.
+
+    cells(sym, l, budget) maps r to the least cost of editing errstr[l:r]
+    into a string derived from sym, for every r where that cost is at most
+    budget; other costs may be missing. The budget of a child is what is
+    left after the symbols before it, so oracles are only asked where a fix
+    is still within reach.
+
+    The alternatives of the start symbol are searched for a fix of cost 0,
+    then 1 and so on, each only once its bound allows that cost; exact
+    matches are thus found without ever looking at the costlier ones.
+    >>> from itertools import product
+    >>> from regfix.regex import *
+    >>> from regfix.regfix import RegFix
+    >>> from regfix.names import distance
+    >>> term = lambda : Concat(KleeneClosure(Union(Literal('ab'), Charset('bc'))), Literal('a'))
+    >>> grammar = Grammar()
+    >>> grammar.add(grammar.symbol(term()))
+    >>> regex = RegEx(term())
+    >>> for s in (''.join(w) for n in range(6) for w in product('abcd', repeat=n)) :
+    ...     fix = CFGFix(grammar, s, 3)
+    ...     assert fix.cost == RegFix(regex, s, 3).cost
+    ...     assert not fix.success or (distance(s, fix.fix()) == fix.cost
+    ...         and RegFix(regex, fix.fix(), 0).cost == 0)
+    '''
+    def __init__(self, grammar:Grammar, errstr:str, max_cost:int=4) :
+        self.grammar = grammar
+        self.errstr = errstr
+        self.max_cost = max_cost
+        self._cells:Dict[Tuple[Symbol, int], Tuple[int, Dict[int, int]]] = dict()
+        self.cost:int = -1
+        self._chosen:Optional[Symbol] = None
+        bounds = sorted((bound, i) for i, bound in grammar.bounds(errstr, max_cost).items())
+        for budget in range(max_cost + 1) :
+            for bound, i in bounds :
+                if bound > budget :
+                    break
+                child = grammar.start.children[i]
+                cost = self.cells(child, 0, budget).get(len(errstr), budget + 1)
+                if cost <= budget :
+                    # nothing was found within budget - 1, so this is optimal
+                    self.cost, self._chosen = cost, child
+                    return
+
+    @property
+    def success(self) -> bool :
+        return self.cost >= 0
+
+    def cells(self, sym:Symbol, l:int, budget:Optional[int]=None) -> Dict[int, int] :
+        if budget is None :
+            budget = self.max_cost
+        if budget < 0 :
+            return dict()
+        key = sym, l
+        known = self._cells.get(key)
+        if known is None or known[0] < budget :
+            known = self._cells[key] = budget, self._compute(sym, l, budget)
+        return known[1]
+
+    def _deletions(self, l:int, bound:int) -> Dict[int, int] :
+        return {l + m : m for m in range(min(bound, len(self.errstr) - l) + 1)}
+
+    def _compute(self, sym:Symbol, l:int, bound:int) -> Dict[int, int] :
+        n, s = len(self.errstr), self.errstr
+        if isinstance(sym, Chars) :
+            # insert the character, or keep one matching character (or
+            # substitute one) and delete the others
+            ret = {l : 1} if bound else dict()
+            matched = False
+            for r in range(l + 1, min(n, l + bound + 1) + 1) :
+                matched = matched or s[r - 1] in sym.chars
+                cost = r - l - 1 + (not matched)
+                if cost <= bound :
+                    ret[r] = cost
+            return ret
+        if isinstance(sym, Nothing) :
+            return self._deletions(l, bound)
+        if isinstance(sym, Oracle) :
+            return sym.oracle.cells(s, l, bound)
+        if isinstance(sym, Alt) :
+            ret = dict()
+            for child in sym.children :
+                for r, cost in self.cells(child, l, bound).items() :
+                    if ret.get(r, bound + 1) > cost :
+                        ret[r] = cost
+            return ret
+        if isinstance(sym, Seq) :
+            cur = {l : 0}
+            for child in sym.children :
+                nxt = dict()
+                for k, base in cur.items() :
+                    for r, cost in self.cells(child, k, bound - base).items() :
+                        cost += base
+                        if nxt.get(r, bound + 1) > cost :
+                            nxt[r] = cost
+                cur = nxt
+            return cur
+        if isinstance(sym, Star) :
+            # zero repetitions delete everything; afterwards extend by one
+            # nonempty repetition at a time, in increasing end position
+            ret = self._deletions(l, bound)
+            for k in range(l, n + 1) :
+                if k not in ret :
+                    continue
+                base = ret[k]
+                for r, cost in self.cells(sym.child, k, bound - base).items() :
+                    cost += base
+                    if r > k and ret.get(r, bound + 1) > cost :
+                        ret[r] = cost
+            return ret
+        raise TypeError(f'unknown symbol {type(sym).__name__}')
+
+    def fix(self) -> Optional[str] :
+        if not self.success :
+            return None
+        ret:List[str] = []
+        self._build(self._chosen, 0, len(self.errstr), self.cost, ret)
+        return ''.join(ret)
+
+    def _build(self, sym:Symbol, l:int, r:int, cost:int, ret:List[str]) :
+        ''' Append to ret a string derived from sym which errstr[l:r] is
+        edited into at the given (optimal) cost. '''
+        s = self.errstr
+        if isinstance(sym, Chars) :
+            matching = [ch for ch in s[l:r] if ch in sym.chars]
+            ret.append(matching[0] if matching else sym.char)
+        elif isinstance(sym, Nothing) :
+            pass
+        elif isinstance(sym, Oracle) :
+            ret.append(sym.oracle.build(s, l, r, cost))
+        elif isinstance(sym, Alt) :
+            for child in sym.children :
+                if self.cells(child, l, cost).get(r) == cost :
+                    return self._build(child, l, r, cost, ret)
+            raise AssertionError('no alternative reaches the recorded cost')
+        elif isinstance(sym, Seq) :
+            # redo the forward pass, then walk the split points backwards
+            layers = [{l : 0}]
+            for child in sym.children[:-1] :
+                nxt = dict()
+                for k, base in layers[-1].items() :
+                    for e, c in self.cells(child, k, cost - base).items() :
+                        if nxt.get(e, cost + 1) > base + c :
+                            nxt[e] = base + c
+                layers.append(nxt)
+            splits = []
+            for child, layer in zip(reversed(sym.children), reversed(layers)) :
+                for k in sorted(layer) :
+                    c = self.cells(child, k, cost - layer[k]).get(r)
+                    if c is not None and layer[k] + c == cost :
+                        splits.append((child, k, r, c))
+                        r, cost = k, layer[k]
+                        break
+                else :
+                    raise AssertionError('no split reaches the recorded cost')
+            for child, k, e, c in reversed(splits) :
+                self._build(child, k, e, c, ret)
+        elif isinstance(sym, Star) :
+            best = self.cells(sym, l, cost)
+            parts = []
+            while cost != r - l :
+                # the last repetition spans [k, r)
+                for k in range(l, r) :
+                    c = self.cells(sym.child, k, cost - best[k]).get(r) if k in best else None
+                    if c is not None and best[k] + c == cost :
+                        parts.append((k, r, c))
+                        r, cost = k, best[k]
+                        break
+                else :
+                    raise AssertionError('no repetition reaches the recorded cost')
+            for k, e, c in reversed(parts) :
+                self._build(sym.child, k, e, c, ret)
+        else :
+            raise TypeError(f'unknown symbol {type(sym).__name__}')
@@ -0,0 +1,161 @@
+import numpy as np
+from typing import List, Optional, Sequence, Tuple, Union
+from .dfa import DFA, MinimalDFA
+
+class DenseTable :
+    ''' A complete DFA as a dense states x charset transition table.
+
+    Inserting or substituting a character costs the same whatever the
+    character, so those moves only need the predecessors of each state.
+    They are kept in pulls: pulls[k] = (states, sources) pairs each state
+    having more than k predecessors with its k-th one. The dead state's
+    predecessors are left out; nothing is reached from it, so its cost
+    never matters.
+    '''
+    def __init__(self, dfa:Union[DFA, MinimalDFA]) :
+        if isinstance(dfa, DFA) :
+            dfa = dfa.minimize()
+        self.dfa = dfa
+        self.charset = dfa.charset
+        self.index = dfa.index
+        self.table = np.array(dfa.transitions, dtype=np.int64).reshape(len(dfa), len(dfa.charset))
+        self.accept = np.array(dfa.accept, dtype=bool)
+        self.initial = dfa.initial
+
+        predecessors:List[List[int]] = [[] for _ in range(len(dfa))]
+        for p, q in sorted({(p, q) for p, row in enumerate(dfa.transitions) for q in row}) :
+            if q != dfa.dead :
+                predecessors[q].append(p)
+        self.pulls:List[Tuple[np.ndarray, np.ndarray]] = []
+        for k in range(max(map(len, predecessors))) :
+            states = [q for q, sources in enumerate(predecessors) if len(sources) > k]
+            self.pulls.append((np.array(states, dtype=np.int64),
+                np.array([predecessors[q][k] for q in states], dtype=np.int64)))
+
+    def __len__(self) -> int :
+        return len(self.table)
+
+    def predecessor_min(self, values:np.ndarray, fill:int) -> np.ndarray :
+        ''' ret[q, j] = min(values[p, j] for each predecessor p of q). '''
+        ret = np.full(values.shape, fill, dtype=values.dtype)
+        for states, sources in self.pulls :
+            ret[states] = np.minimum(ret[states], values[sources])
+        return ret
+
+    def encode(self, errstrs:Sequence[str]) -> np.ndarray :
+        ''' ret[i, j] is the charset index of errstrs[j][i], -1 where there is
+        none (past the end, or outside the charset). '''
+        ret = np.full((max(map(len, errstrs), default=0), len(errstrs)), -1, dtype=np.int64)
+        for j, s in enumerate(errstrs) :
+            ret[:len(s), j] = [self.index.get(ch, -1) for ch in s]
+        return ret
+
+class DenseBatch :
+    ''' Edit-distance DP over a DenseTable for a whole batch of lines at once:
+    every step works on states x lines arrays.
+
+    layers[i][q, j] is the least cost of reaching state q after consuming
+    i characters of line j (insertions included), capped at max_cost + 1;
+    lines shorter than i keep their last layer.
+    '''
+    def __init__(self, table:Union[DenseTable, DFA, MinimalDFA], errstrs:Sequence[str],
+            max_cost:int=4) :
+        if not isinstance(table, DenseTable) :
+            table = DenseTable(table)
+        self.table = table
+        self.errstrs = list(errstrs)
+        self.max_cost = max_cost
+        inf = max_cost + 1
+        # costs go up to inf + 1 before they are capped; the smallest signed
+        # type holding it (whose minimum is -(inf + 2) or less) keeps the
+        # arrays small
+        dtype = np.min_scalar_type(-(inf + 2))
+        n_states = len(table)
+        batch = len(self.errstrs)
+        lengths = np.array([len(s) for s in self.errstrs], dtype=np.int64)
+        codes = table.encode(self.errstrs)
+
+        # bases[i] holds the costs before the insertion closure of layers[i]
+        layer = np.full((n_states, batch), inf, dtype=dtype)
+        layer[table.initial] = 0
+        self.bases:List[np.ndarray] = [layer]
+        self.layers:List[np.ndarray] = [self._close(layer)]
+        for i, columns in enumerate(codes) :
+            prev = self.layers[-1]
+            # substitute, or delete
+            base = np.minimum(table.predecessor_min(prev, inf - 1) + 1, prev + 1)
+            # match: scatter-min each reached state's cost into its successor
+            # on the line's character; lines without one go to an extra row
+            # that is dropped
+            reached = np.flatnonzero(prev < inf)
+            states, lines = np.divmod(reached, batch)
+            chars = columns[lines]
+            successors = table.table[states, chars]
+            successors[chars < 0] = n_states
+            matched = np.full((n_states + 1) * batch, inf, dtype=dtype)
+            np.minimum.at(matched, successors * batch + lines, prev.ravel()[reached])
+            matched = matched.reshape(n_states + 1, batch)
+            base = np.minimum(np.minimum(base, matched[:n_states]), inf)
+            active = lengths > i
+            self.bases.append(np.where(active, base, self.bases[-1]))
+            self.layers.append(np.where(active, self._close(base), prev))
+
+        costs = np.where(table.accept[:, None], self.layers[-1], inf).min(axis=0, initial=inf)
+        self.costs:List[int] = [int(c) if c <= max_cost else -1 for c in costs]
+
+    def _close(self, layer:np.ndarray) -> np.ndarray :
+        # each round adds one more insertion, so max_cost rounds suffice
+        inf = self.max_cost + 1
+        for _ in range(self.max_cost) :
+            closed = np.minimum(layer, self.table.predecessor_min(layer, inf - 1) + 1)
+            if np.array_equal(closed, layer) :
+                break
+            layer = closed
+        return layer
+
+    def fix(self, j:int) -> Optional[str] :
+        ''' A fix of line j at its optimal cost, or None. '''
+        cost = self.costs[j]
+        if cost < 0 :
+            return None
+        table, charset, errstr = self.table.table, self.table.charset, self.errstrs[j]
+        i = len(errstr)
+        q = int(np.flatnonzero(self.table.accept & (self.layers[i][:, j] == cost))[0])
+        ret = []
+        while i > 0 or cost > 0 :
+            if cost != self.bases[i][q, j] :
+                # inserted a character without consuming input
+                p, c = np.argwhere((table == q) & (self.layers[i][:, j, None] + 1 == cost))[0]
+                ret.append(charset[c])
+                q, cost = int(p), cost - 1
+                continue
+            prev = self.layers[i - 1][:, j].astype(np.int64)
+            if prev[q] + 1 == cost :
+                # deleted errstr[i - 1]
+                cost -= 1
+            else :
+                mismatch = np.ones(len(charset), dtype=np.int64)
+                if errstr[i - 1] in self.table.index :
+                    mismatch[self.table.index[errstr[i - 1]]] = 0
+                p, c = np.argwhere((table == q) & (prev[:, None] + mismatch[None, :] == cost))[0]
+                ret.append(charset[c])
+                q, cost = int(p), cost - int(mismatch[c])
+            i -= 1
+        return ''.join(reversed(ret))
+
+class DenseFix :
+    ''' DenseBatch for a single line. The array work is per batch, not per
+    line, so for one line at a time RegFix or BitParallel are faster. '''
+    def __init__(self, table:Union[DenseTable, DFA, MinimalDFA], errstr:str, max_cost:int=4) :
+        self.batch = DenseBatch(table, [errstr], max_cost)
+        self.table = self.batch.table
+        self.errstr = errstr
+        self.max_cost = max_cost
+        self.cost:int = self.batch.costs[0]
+
+    @property
+    def success(self) -> bool :
+        return self.cost >= 0
+
+    def fix(self) -> Optional[str] :
+        return self.batch.fix(0)
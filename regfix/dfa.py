@@ -1,36 +1,105 @@
 from .regex import RegEx, Term, Leaf
-from typing import Set
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Optional, Set
+from collections import OrderedDict, deque
 from .memoize import *
-from graphviz import Digraph
+if TYPE_CHECKING :
+    from graphviz import Digraph
 import functools
 
 class _Graphviz_Drawer :
     def __init__(self, name:str='') :
+        # graphviz is slow to import and only needed here
+        from graphviz import Digraph
         self.graph = Digraph(name=name)
         self.statemap:Dict['State', int] = dict()
         self.graph.attr(rankdir='LR')
 
 class DFA :
-    def __init__(self, expr:RegEx, charset:str) :
+    def __init__(self, expr:RegEx, charset:str, max_states:int=None) :
+        ''' States are built lazily. With max_states, at most that many are
+        cached, and the least recently used ones are evicted and rebuilt on
+        demand. '''
         assert isinstance(expr, RegEx)
         self.regex:Term = expr.term
-        self.states:Dict[Set[Leaf], 'State'] = dict()
+        self.states:Dict[Set[Leaf], 'State'] = OrderedDict()
         self.charset:str = charset
+        self.max_states:Optional[int] = max_states
+        self.created:int = 0
+        self.evicted:int = 0
         self.nullstate:'State' = self.get_state(frozenset())
 
     def get_state(self, leaves:Set[Leaf]) -> 'State' :
         leaves = frozenset(leaves)
-        if leaves not in self.states :
-            self.states[leaves] = State(self, leaves)
-        return self.states[leaves]
+        state = self.states.get(leaves)
+        if state is None :
+            state = self.states[leaves] = State(self, leaves)
+            self.created += 1
+            if self.max_states is not None and len(self.states) > self.max_states :
+                self.states.popitem(last=False)
+                self.evicted += 1
+        elif self.max_states is not None :
+            self.states.move_to_end(leaves)
+        return state
 
     @memoize_property
     def initial(self) -> 'State' :
         return self.get_state(self.regex.first)
 
-    def export_graphviz(self, name:str='') -> Digraph :
+    def accepts(self, s:str) -> bool :
+        state = self.initial
+        for ch in s :
+            state = state.next(ch)
+        return state.accept
+
+    def minimize(self) -> 'MinimalDFA' :
+        ''' Build every reachable state and merge equivalent ones (Hopcroft).
+        The subsets of leaves are numbered and stepped here directly rather
+        than through State objects, so neither the state cache nor its
+        bound is involved; what is held is one leaf set per state and the
+        integer transition table.
+        >>> from regfix.regex import *
+        >>> dfa = DFA(RegEx(Union(Literal('ab'), Literal('cb'))), 'abc')
+        >>> minimal = dfa.minimize()
+        >>> minimal.original_size, len(minimal)
+        (5, 4)
+        '''
+        column:Dict[str, int] = {ch : i for i, ch in enumerate(self.charset)}
+        initial = frozenset(self.regex.first)
+        index:Dict[FrozenSet[Leaf], int] = {initial : 0}
+        pending = deque([initial])
+        table:List[List[int]] = []
+        accepting:List[bool] = []
+        while pending :
+            leaves = pending.popleft()
+            successors:Dict[int, Set[Leaf]] = dict()
+            for leaf in leaves :
+                for ch in leaf.chars :
+                    if ch in column :
+                        successors.setdefault(column[ch], set()).update(leaf.follow)
+            row = []
+            for c in range(len(self.charset)) :
+                nxt = frozenset(successors.get(c, ()))
+                if nxt not in index :
+                    index[nxt] = len(index)
+                    pending.append(nxt)
+                row.append(index[nxt])
+            table.append(row)
+            accepting.append(any(leaf.is_terminator for leaf in leaves))
+
+        block_of = _hopcroft(table, accepting, len(self.charset))
+        size = max(block_of) + 1
+        transitions:List[List[int]] = [None] * size
+        accept:List[bool] = [False] * size
+        for i, row in enumerate(table) :
+            transitions[block_of[i]] = [block_of[j] for j in row]
+            accept[block_of[i]] = accepting[i]
+        empty = frozenset()
+        dead = block_of[index[empty]] if empty in index else None
+        return MinimalDFA(self.charset, transitions, accept, block_of[0], dead, len(index))
+
+    def export_graphviz(self, name:str='') -> 'Digraph' :
         ''' Generate graphviz object.
-        >>> from regex import *
+        >>> from regfix.regex import *
         >>> dfa = DFA(RegEx(KleeneClosure(Union(Literal('foo'), Literal('bar')))),
         ... 'abcdefghijklmnopqrstuvwxyz')
         >>> print(dfa.export_graphviz('DFA').source) # doctest: +NORMALIZE_WHITESPACE
@@ -58,10 +127,14 @@ class State :
     def __init__(self, dfa:DFA, leaves:Set[Leaf]) :
         self.dfa = dfa
         self.leaves = frozenset(leaves)
+        self.transitions:Dict[str, FrozenSet[Leaf]] = dict()
 
     def __hash__(self) ->int :
         return hash(self.leaves)
 
+    def __eq__(self, another) -> bool :
+        return isinstance(another, State) and self.leaves == another.leaves
+
     def __repr__(self) -> str :
         return repr(self.leaves) + ' ' + ':'.join(map(lambda x: str(x.follow), self.leaves))
     
@@ -72,13 +145,15 @@ class State :
                 return True
         return False
 
-    @memoize
-    def next(self, char:str) :
-        ret = set()
-        for leaf in self.leaves :
-            if leaf.char == char :
-                ret |= leaf.follow
-        return self.dfa.get_state(ret)
+    def next(self, char:str) -> 'State' :
+        # transitions are kept as leaf sets, so that they do not pin evicted states
+        if char not in self.transitions :
+            ret = set()
+            for leaf in self.leaves :
+                if leaf.matches(char) :
+                    ret |= leaf.follow
+            self.transitions[char] = frozenset(ret)
+        return self.dfa.get_state(self.transitions[char])
 
     def _export_graphviz(self, drawer:_Graphviz_Drawer) :
         if self in drawer.statemap :
@@ -90,4 +165,80 @@ class State :
             next_identifier = self.next(ch)._export_graphviz(drawer)
             if next_identifier :
                 drawer.graph.edge(str(identifier), str(next_identifier), label=ch)
-        return identifier
\ No newline at end of file
+        return identifier
+
+class MinimalDFA :
+    ''' A complete DFA over charset with integer states; transitions[q][i]
+    is the successor of q on charset[i]. '''
+    def __init__(self, charset:str, transitions:List[List[int]], accept:List[bool],
+            initial:int, dead:Optional[int], original_size:int) :
+        self.charset = charset
+        self.transitions = transitions
+        self.accept = accept
+        self.initial = initial
+        self.dead = dead
+        self.original_size = original_size
+        self.index:Dict[str, int] = {ch : i for i, ch in enumerate(charset)}
+
+    def __len__(self) -> int :
+        return len(self.transitions)
+
+    def accepts(self, s:str) -> bool :
+        state = self.initial
+        for ch in s :
+            if ch not in self.index :
+                return False
+            state = self.transitions[state][self.index[ch]]
+        return self.accept[state]
+
+    def export_graphviz(self, name:str='') -> 'Digraph' :
+        from graphviz import Digraph
+        graph = Digraph(name=name)
+        graph.attr(rankdir='LR')
+        for q, row in enumerate(self.transitions) :
+            if q == self.dead :
+                continue
+            graph.node(str(q), shape='doublecircle' if self.accept[q] else 'circle')
+            for ch, nxt in zip(self.charset, row) :
+                if nxt != self.dead :
+                    graph.edge(str(q), str(nxt), label=ch)
+        return graph
+
+def _hopcroft(table:List[List[int]], accepting:List[bool], k:int) -> List[int] :
+    ''' Partition the states of a complete DFA into equivalence classes;
+    returns the class of each state, numbered in order of first appearance. '''
+    n = len(table)
+    inverse:List[Dict[int, List[int]]] = [dict() for _ in range(k)]
+    for p, row in enumerate(table) :
+        for c, q in enumerate(row) :
+            inverse[c].setdefault(q, []).append(p)
+
+    blocks:List[Set[int]] = [b for b in ({i for i in range(n) if accepting[i]},
+        {i for i in range(n) if not accepting[i]}) if b]
+    block_of = [0] * n
+    for b, block in enumerate(blocks) :
+        for q in block :
+            block_of[q] = b
+    work = set(range(len(blocks)))
+    while work :
+        splitter = set(blocks[work.pop()])
+        for c in range(k) :
+            touched:Dict[int, Set[int]] = dict()
+            for q in splitter :
+                for p in inverse[c].get(q, ()) :
+                    touched.setdefault(block_of[p], set()).add(p)
+            for b, inside in touched.items() :
+                if len(inside) == len(blocks[b]) :
+                    continue
+                blocks[b] -= inside
+                nb = len(blocks)
+                blocks.append(inside)
+                for p in inside :
+                    block_of[p] = nb
+                if b in work or len(inside) <= len(blocks[b]) :
+                    work.add(nb)
+                else :
+                    work.add(b)
+
+    renumber:Dict[int, int] = dict()
+    return [renumber.setdefault(b, len(renumber)) for b in block_of]
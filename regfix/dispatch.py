@@ -0,0 +1,75 @@
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from .regex import RegEx
+from .automaton import Automaton
+from .regfix import RegFix
+from .bitparallel import BitParallel
+from .names import NameTrie
+
+class CommandIndex :
+    ''' Per-command regexes indexed by command name. A regex may also be
+    given as a function building it; it is called, and the automaton is
+    compiled, the first time its command is searched. '''
+    def __init__(self, commands:Iterable[Tuple[str, Union[RegEx, Automaton, Callable[[], RegEx]]]]) :
+        self.names:List[str] = []
+        self.regexes:List[Union[RegEx, Automaton, Callable[[], RegEx]]] = []
+        self.trie = NameTrie()
+        for name, regex in commands :
+            self.trie.add(name, len(self.names))
+            self.names.append(name)
+            self.regexes.append(regex)
+
+    def __len__(self) -> int :
+        return len(self.names)
+
+    def automaton(self, item:int) -> Automaton :
+        regex = self.regexes[item]
+        if not isinstance(regex, (RegEx, Automaton)) :
+            regex = regex()
+        self.regexes[item] = regex = Automaton.of(regex)
+        return regex
+
+    def candidates(self, errstr:str, max_cost:int) -> List[Tuple[int, int]] :
+        ''' (lower bound, command index) pairs, most plausible first. '''
+        return sorted((bound, item) for item, bound in self.trie.bounds(errstr, max_cost).items())
+
+class IndexedFix :
+    ''' Fix errstr against the commands of a CommandIndex, searching them in
+    the order of their name bounds and skipping those whose bound exceeds
+    the best cost found. The cost and fix are those of a search over the
+    union of all commands.
+
+    The commands are costed by BitParallel alone; only those reaching the
+    best cost are searched by RegFix for their fixes. '''
+    def __init__(self, index:CommandIndex, errstr:str, max_cost:int=4) :
+        self.index = index
+        self.errstr = errstr
+        self.searched:int = 0
+        # the optimal fixes of the commands found to tie on the best cost
+        self.best:List[str] = []
+        self.cost:int = -1
+        cost = max_cost
+        tied:List[int] = []
+        for bound, item in index.candidates(errstr, max_cost) :
+            if bound > cost :
+                break
+            self.searched += 1
+            found = BitParallel.of(index.automaton(item)).cost(errstr, cost)
+            if found < 0 :
+                continue
+            if found < self.cost :
+                tied = []
+            tied.append(item)
+            self.cost = cost = found
+        for item in tied :
+            self.best.append(errstr if cost == 0 else
+                RegFix(index.automaton(item), errstr, cost).fix())
+
+    @property
+    def success(self) -> bool :
+        return self.cost >= 0
+
+    def fix(self) -> Optional[str] :
+        ''' The lexicographically least optimal fix over all commands. '''
+        if not self.success :
+            return None
+        return min(self.best)
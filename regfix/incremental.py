@@ -0,0 +1,122 @@
+from typing import Dict, List, Optional, Tuple, Union
+from .regex import RegEx
+from .automaton import Automaton
+
+# A layer holds, for one input position, the least cost of every automaton
+# position reachable within max_cost, and a back pointer (prev, action, same)
+# per entry: prev is the state it came from, action the code point emitted
+# (-1 for none), and same tells whether prev is in this layer (an insertion)
+# or in the previous one.
+Layer = Dict[int, int]
+Back = Dict[int, Tuple[int, int, bool]]
+
+def initial_layer(automaton:Automaton, max_cost:int) -> Tuple[Layer, Back] :
+    layer = {s : 0 for s in automaton.initial}
+    back = {s : (-1, -1, True) for s in automaton.initial}
+    _close(automaton, layer, back, max_cost)
+    return layer, back
+
+def next_layer(automaton:Automaton, layer:Layer, ch:int, max_cost:int) -> Tuple[Layer, Back] :
+    ''' The layer after consuming the code point ch. '''
+    chars, starts, ends, targets = automaton.chars, automaton.starts, automaton.ends, automaton.targets
+    members = automaton.members
+    nxt:Layer = dict()
+    back:Back = dict()
+    for s, cost in layer.items() :
+        # enter, emitting ch itself on a match
+        if ch in members[s] :
+            c, emit = cost, ch
+        else :
+            c, emit = cost + 1, chars[s]
+        if c <= max_cost :
+            for t in targets[starts[s]:ends[s]] :
+                if nxt.get(t, max_cost + 1) > c :
+                    nxt[t] = c
+                    back[t] = s, emit, False
+        # delete
+        c = cost + 1
+        if c <= max_cost and nxt.get(s, max_cost + 1) > c :
+            nxt[s] = c
+            back[s] = s, -1, False
+    _close(automaton, nxt, back, max_cost)
+    return nxt, back
+
+def _close(automaton:Automaton, layer:Layer, back:Back, max_cost:int) :
+    ''' Add insertions to layer, cheapest first. '''
+    chars, starts, ends, targets = automaton.chars, automaton.starts, automaton.ends, automaton.targets
+    buckets:List[List[int]] = [[] for _ in range(max_cost)]
+    for s, cost in layer.items() :
+        if cost < max_cost :
+            buckets[cost].append(s)
+    for cost, bucket in enumerate(buckets) :
+        c = cost + 1
+        for s in bucket :
+            if layer[s] != cost :
+                continue
+            for t in targets[starts[s]:ends[s]] :
+                if layer.get(t, max_cost + 1) > c :
+                    layer[t] = c
+                    back[t] = s, chars[s], True
+                    if c < max_cost :
+                        buckets[c].append(t)
+
+def best_terminator(automaton:Automaton, layer:Layer) -> Optional[int] :
+    accepts = automaton.accepts
+    found = [(cost, s) for s, cost in layer.items() if accepts[s]]
+    return min(found)[1] if found else None
+
+class IncrementalFix :
+    ''' Fix a string that is edited at its end, one keystroke at a time.
+
+    The layers of every prefix are kept, so appending a character costs one
+    layer step, and deleting characters just drops layers.
+    '''
+    def __init__(self, regex:Union[RegEx, Automaton], max_cost:int=4) :
+        self.automaton = Automaton.of(regex)
+        self.max_cost = max_cost
+        self.text:str = ''
+        self.layers:List[Layer] = []
+        self.backs:List[Back] = []
+        layer, back = initial_layer(self.automaton, max_cost)
+        self.layers.append(layer)
+        self.backs.append(back)
+
+    def append(self, s:str) :
+        for ch in s :
+            layer, back = next_layer(self.automaton, self.layers[-1], ord(ch), self.max_cost)
+            self.layers.append(layer)
+            self.backs.append(back)
+        self.text += s
+
+    def pop(self, count:int=1) :
+        count = min(count, len(self.text))
+        if count :
+            del self.layers[-count:]
+            del self.backs[-count:]
+            self.text = self.text[:-count]
+
+    @property
+    def cost(self) -> int :
+        termini = best_terminator(self.automaton, self.layers[-1])
+        return -1 if termini is None else self.layers[-1][termini]
+
+    @property
+    def success(self) -> bool :
+        return self.cost >= 0
+
+    def fix(self) -> Optional[str] :
+        s = best_terminator(self.automaton, self.layers[-1])
+        if s is None :
+            return None
+        ret = []
+        pos = len(self.text)
+        while True :
+            prev, action, same = self.backs[pos][s]
+            if prev < 0 :
+                break
+            if action >= 0 :
+                ret.append(chr(action))
+            if not same :
+                pos -= 1
+            s = prev
+        return ''.join(reversed(ret))
@@ -0,0 +1,71 @@
+from math import isqrt
+from typing import Dict, List, Optional, Union
+from .regex import RegEx
+from .automaton import Automaton
+from .incremental import Layer, Back, initial_layer, next_layer, best_terminator
+
+def layered_cost(regex:Union[RegEx, Automaton], errstr:str, max_cost:int=4) -> int :
+    ''' The minimal edit cost of errstr (-1 if above max_cost), keeping only
+    the current and the next layer alive. '''
+    automaton = Automaton.of(regex)
+    layer, _ = initial_layer(automaton, max_cost)
+    for ch in errstr :
+        if not layer :
+            return -1
+        layer, _ = next_layer(automaton, layer, ord(ch), max_cost)
+    termini = best_terminator(automaton, layer)
+    return -1 if termini is None else layer[termini]
+
+class LayeredFix :
+    ''' Fix errstr in memory sublinear in its length.
+
+    The forward pass keeps only every k-th layer (k ~ sqrt(len(errstr))).
+    fix() walks the segments between checkpoints backwards, recomputing one
+    segment's layers and back pointers at a time.
+    '''
+    def __init__(self, regex:Union[RegEx, Automaton], errstr:str, max_cost:int=4,
+            interval:int=None) :
+        self.automaton = automaton = Automaton.of(regex)
+        self.errstr = errstr
+        self.max_cost = max_cost
+        self.interval:int = interval or max(1, isqrt(len(errstr)))
+
+        layer, _ = initial_layer(automaton, max_cost)
+        self.checkpoints:Dict[int, Layer] = {0 : layer}
+        for pos, ch in enumerate(errstr) :
+            if pos % self.interval == 0 :
+                self.checkpoints[pos] = layer
+            layer, _ = next_layer(automaton, layer, ord(ch), max_cost)
+        self.termini:Optional[int] = best_terminator(automaton, layer)
+        self.cost:int = -1 if self.termini is None else layer[self.termini]
+
+    @property
+    def success(self) -> bool :
+        return self.termini is not None
+
+    def fix(self) -> Optional[str] :
+        if not self.success :
+            return None
+        automaton, max_cost = self.automaton, self.max_cost
+        ret:List[str] = []
+        pos, s = len(self.errstr), self.termini
+        for start in sorted(self.checkpoints, reverse=True) :
+            # recompute the back pointers of layers start+1 .. pos
+            if start == 0 :
+                layer, back = initial_layer(automaton, max_cost)
+                backs:Dict[int, Back] = {0 : back}
+            else :
+                layer, backs = self.checkpoints[start], dict()
+            for i in range(start, pos) :
+                layer, backs[i + 1] = next_layer(automaton, layer, ord(self.errstr[i]), max_cost)
+            # layer start's own back pointers belong to the previous segment
+            while pos in backs :
+                prev, action, same = backs[pos][s]
+                if prev < 0 :
+                    break
+                if action >= 0 :
+                    ret.append(chr(action))
+                if not same :
+                    pos -= 1
+                s = prev
+        return ''.join(reversed(ret))
@@ -1,14 +1,32 @@
 from functools import wraps
 
+# Caches live on the instances themselves, so they are freed together with
+# them; a module-level table keyed by self would keep every instance alive.
+
 def memoize(method) :
-    memo = dict()
+    ''' Cache method(self, *args) in a dict stored on self. '''
+    attr = '_memo_' + method.__name__
     @wraps(method)
-    def _impl(*args) :
+    def _impl(self, *args) :
+        memo = self.__dict__.get(attr)
+        if memo is None :
+            memo = self.__dict__[attr] = dict()
         if args not in memo :
-            memo[args] = method(*args)
+            memo[args] = method(self, *args)
         return memo[args]
     return _impl
-        
 
-def memoize_property(func) :
-    return property(memoize(func))
\ No newline at end of file
+class memoize_property :
+    ''' A property computed once per instance. The value is stored in the
+    instance's __dict__ under the property's name, where it shadows this
+    (non-data) descriptor from then on. '''
+    def __init__(self, func) :
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner=None) :
+        if instance is None :
+            return self
+        value = instance.__dict__[self.name] = self.func(instance)
+        return value
@@ -0,0 +1,242 @@
+import os
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+def distance(a:str, b:str) -> int :
+    ''' The edit distance between a and b. '''
+    prev = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1) :
+        cur = [i]
+        for j, y in enumerate(b, 1) :
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (x != y)))
+        prev = cur
+    return prev[-1]
+
+class NameTrie :
+    ''' A trie of command names; each name maps to the indices it was added with. '''
+    def __init__(self) :
+        self.children:Dict[str, 'NameTrie'] = dict()
+        self.items:List[int] = []
+
+    def add(self, name:str, item:int) :
+        node = self
+        for ch in name :
+            node = node.children.setdefault(ch, NameTrie())
+        node.items.append(item)
+
+    def bounds(self, errstr:str, max_cost:int) -> Dict[int, int] :
+        ''' For every item whose name can start a line within max_cost edits,
+        a lower bound on that cost: the least cost of deleting the non-blank
+        characters before the name, plus the edit distance between the name
+        and some substring of errstr right after them. '''
+        # column[i]: least cost of turning errstr[:i] into the name prefix so far
+        column = [0]
+        for ch in errstr :
+            column.append(column[-1] + (ch != ' '))
+        ret:Dict[int, int] = dict()
+        stack = [(self, column)]
+        while stack :
+            node, column = stack.pop()
+            best = min(column)
+            if best > max_cost :
+                continue
+            for item in node.items :
+                ret[item] = best
+            for ch, child in node.children.items() :
+                nxt = [column[0] + 1]
+                for i, e in enumerate(errstr) :
+                    nxt.append(min(column[i + 1] + 1, nxt[i] + 1, column[i] + (e != ch)))
+                stack.append((child, nxt))
+        return ret
+
+# trie nodes are dicts from characters to children; a name ending at a node
+# is stored under the key None
+_Node = Dict[Optional[str], object]
+
+class NameIndex :
+    ''' A trie of names with bounded edit distance lookups. '''
+    def __init__(self, names:Iterable[str]=()) :
+        self.root:_Node = dict()
+        self.longest:int = 0
+        self.size:int = 0
+        for name in names :
+            self.add(name)
+
+    def add(self, name:str) :
+        node = self.root
+        for ch in name :
+            node = node.setdefault(ch, dict())
+        if None not in node :
+            node[None] = name
+            self.size += 1
+            self.longest = max(self.longest, len(name))
+
+    def __len__(self) -> int :
+        return self.size
+
+    def lookup(self, word:str, bound:int) -> List[Tuple[int, str]] :
+        ''' (distance, name) of the names within bound edits of word, closest
+        and then least first. '''
+        ret = []
+        stack = [(self.root, list(range(len(word) + 1)))]
+        while stack :
+            node, row = stack.pop()
+            if None in node and row[-1] <= bound :
+                ret.append((row[-1], node[None]))
+            for ch, child in _children(node, row, bound, word) :
+                nxt = [row[0] + 1]
+                for j, w in enumerate(word) :
+                    nxt.append(min(row[j + 1] + 1, nxt[j] + 1, row[j] + (w != ch)))
+                if min(nxt) <= bound :
+                    stack.append((child, nxt))
+        return sorted(ret)
+
+    def costs(self, text:str, start:int, bound:int) -> Dict[int, int] :
+        ''' Map every end such that text[start:end] is within bound edits of
+        some name to the least such distance.
+        >>> names = ['ab', 'abc', 'ba', 'c.d', 'bb']
+        >>> index = NameIndex(names)
+        >>> text = 'x abd c.a ba'
+        >>> for start in range(len(text) + 1) :
+        ...     for bound in range(4) :
+        ...         costs = {end : min(distance(text[start:end], name) for name in names)
+        ...             for end in range(start, len(text) + 1)}
+        ...         assert index.costs(text, start, bound) == {
+        ...             end : c for end, c in costs.items() if c <= bound}
+        ...         word = text[start:]
+        ...         assert index.lookup(word, bound) == sorted((distance(word, name), name)
+        ...             for name in names if distance(word, name) <= bound)
+        '''
+        # at depth d, band[i] is the distance between the trie path and
+        # text[start:start+j] for j = d - bound + i; other ends are out of bound
+        width = min(len(text) - start, self.longest + bound)
+        inf = bound + 1
+        size = 2 * bound + 1
+        ret:Dict[int, int] = dict()
+        stack = [(self.root, 0, [j if 0 <= j <= width else inf
+            for j in range(-bound, bound + 1)])]
+        while stack :
+            node, depth, band = stack.pop()
+            if None in node :
+                for i, c in enumerate(band) :
+                    end = start + depth - bound + i
+                    if c < ret.get(end, inf) :
+                        ret[end] = c
+            first = depth + 1 - bound
+            chars = text[start + max(0, first - 1):start + max(0, first - 1 + size)]
+            for ch, child in _children(node, band, bound, chars) :
+                nxt = []
+                left, best = inf, inf
+                for i in range(size) :
+                    j = first + i
+                    if j < 0 or j > width :
+                        left = inf
+                    else :
+                        left = min(left + 1, band[i + 1] + 1 if i + 1 < size else inf,
+                            band[i] + (text[start + j - 1] != ch) if j else inf, inf)
+                        best = min(best, left)
+                    nxt.append(left)
+                if best < inf :
+                    stack.append((child, depth + 1, nxt))
+        return ret
+
+def _children(node:_Node, values:List[int], bound:int, chars:str) -> Iterable[Tuple[str, _Node]] :
+    # if nothing is below bound, a child can only stay within it by matching
+    # one of chars, so only those children are looked up
+    if min(values) < bound :
+        return [(ch, child) for ch, child in node.items() if ch is not None]
+    return [(ch, node[ch]) for ch in set(chars) if ch in node]
+
+class FileOracle :
+    ''' The names in a directory, as an oracle for cfg.Oracle symbols.
+
+    The directory is scanned again whenever its modification time changes;
+    scans are cached by the instance. Names more than max_distance edits
+    away are never proposed, which also keeps lookups in large directories
+    fast. . and .. are names of every directory, and globs are kept as
+    they are. directories is the same oracle restricted to the
+    subdirectories, sharing the scans.
+    '''
+    def __init__(self, directory:str='.', max_distance:int=2) :
+        self.directory = directory
+        self.max_distance = max_distance
+        self.scans:int = 0
+        self.directories = _Directories(self)
+        self._mtime:Optional[int] = None
+        # the names of all the entries, then of the directories only; the
+        # tries are only built once a name has to be corrected
+        self._names:List[FrozenSet[str]] = [frozenset()] * 2
+        self._longest:int = 0
+        self._indexes:List[Optional[NameIndex]] = [None] * 2
+
+    def _scan(self, directories:bool=False) -> FrozenSet[str] :
+        try :
+            mtime = os.stat(self.directory).st_mtime_ns
+        except OSError :
+            mtime = None
+        if mtime != self._mtime :
+            files, dirs = [], []
+            if mtime is not None :
+                files, dirs = ['.', '..'], ['.', '..']
+                with os.scandir(self.directory) as entries :
+                    for entry in entries :
+                        files.append(entry.name)
+                        if entry.is_dir() :
+                            dirs.append(entry.name)
+            self._names = [frozenset(files), frozenset(dirs)]
+            self._longest = max(map(len, files), default=0)
+            self._indexes = [None] * 2
+            self._mtime = mtime
+            self.scans += 1
+        return self._names[directories]
+
+    def _index(self, directories:bool=False) -> NameIndex :
+        names = self._scan(directories)
+        if self._indexes[directories] is None :
+            self._indexes[directories] = NameIndex(names)
+        return self._indexes[directories]
+
+    @property
+    def index(self) -> NameIndex :
+        return self._index()
+
+    def cells(self, text:str, start:int, bound:int, directories:bool=False) -> Dict[int, int] :
+        bound = min(bound, self.max_distance)
+        if bound :
+            ret = self._index(directories).costs(text, start, bound)
+        else :
+            names = self._scan(directories)
+            ret = {end : 0 for end in range(start, min(len(text), start + self._longest) + 1)
+                if text[start:end] in names}
+        for end in _globs(text, start) :
+            ret[end] = 0
+        return ret
+
+    def build(self, text:str, start:int, end:int, cost:int, directories:bool=False) -> str :
+        ''' The least name that text[start:end] is cost edits away from. '''
+        if cost == 0 :
+            # a name, or a glob
+            return text[start:end]
+        found = [name for d, name in self._index(directories).lookup(text[start:end], cost) if d == cost]
+        return found[0]
+
+class _Directories :
+    ''' The subdirectories of a FileOracle. '''
+    def __init__(self, files:FileOracle) :
+        self.files = files
+
+    def cells(self, text:str, start:int, bound:int) -> Dict[int, int] :
+        return self.files.cells(text, start, bound, directories=True)
+
+    def build(self, text:str, start:int, end:int, cost:int) -> str :
+        return self.files.build(text, start, end, cost, directories=True)
+
+def _globs(text:str, start:int) -> List[int] :
+    # the ends of the globs starting at start; a glob is passed on by the
+    # shell whether or not it matches, and names cannot correct it anyway
+    ret = []
+    end = start
+    while end < len(text) and not text[end].isspace() :
+        end += 1
+        if any(ch in text[start:end] for ch in '*?[') :
+            ret.append(end)
+    return ret
@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from .dispatch import CommandIndex
+from .regfix import RegFix
+
+# the state of a worker process, set once by _init_worker: the index, and the
+# best cost found so far by any worker, with the lock guarding its updates
+_index:CommandIndex = None
+_best = None
+_lock = None
+
+def _init_worker(index:CommandIndex, best, lock) :
+    global _index, _best, _lock
+    _index, _best, _lock = index, best, lock
+
+def _ready() :
+    pass
+
+def _search(item:int, bound:int, errstr:str, max_cost:int) -> Tuple[int, Optional[str]] :
+    if bound > _best.value :
+        return -1, None
+    fix = RegFix(_index.automaton(item), errstr, max_cost, limit=_best)
+    if not fix.success :
+        return -1, None
+    with _lock :
+        if fix.cost < _best.value :
+            _best.value = fix.cost
+    return fix.cost, fix.fix()
+
+class ParallelFixer :
+    ''' Branch and bound over the commands of a CommandIndex, with the
+    candidates searched by a pool of worker processes.
+
+    The workers share the best cost found so far through shared memory;
+    each search prunes against it, and candidates whose name bound exceeds
+    it are skipped. Requests are served one at a time.
+    '''
+    def __init__(self, index:CommandIndex, workers:int=None) :
+        # compile every command before forking, so the workers share them
+        for item in range(len(index)) :
+            index.automaton(item)
+        self.index = index
+        self.workers = workers or os.cpu_count()
+        context = multiprocessing.get_context('fork')
+        self._best = context.RawValue('i', 0)
+        self._lock = context.Lock()
+        self._request_lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(self.workers, context, _init_worker,
+            (index, self._best, self._lock))
+        # the pool forks its workers on the first submit; do it now, while
+        # this process has a single thread, rather than from a server thread
+        for future in [self._executor.submit(_ready) for _ in range(self.workers)] :
+            future.result()
+
+    def fix(self, errstr:str, max_cost:int=4) -> Tuple[Optional[str], int] :
+        ''' The globally optimal (fix, cost), as IndexedFix would find it. '''
+        with self._request_lock :
+            self._best.value = max_cost
+            futures = [self._executor.submit(_search, item, bound, errstr, max_cost)
+                for bound, item in self.index.candidates(errstr, max_cost)]
+            results:List[Tuple[int, Optional[str]]] = [
+                future.result() for future in futures]
+        found = [(cost, fix) for cost, fix in results if cost >= 0]
+        if not found :
+            return None, -1
+        cost = min(cost for cost, _ in found)
+        return min(fix for c, fix in found if c == cost), cost
+
+    def close(self) :
+        self._executor.shutdown()
+
+    def __enter__(self) -> 'ParallelFixer' :
+        return self
+
+    def __exit__(self, *exc) :
+        self.close()
@@ -0,0 +1,119 @@
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+from .regex import RegEx
+from .automaton import Automaton
+from .regfix import correct
+from .names import distance
+from .batch import _correct_chunk
+if TYPE_CHECKING :
+    from concurrent.futures import Executor
+
+SEPARATORS:Tuple[str, ...] = ('|', '||', '&&', ';')
+
+def split(line:str) -> Tuple[List[str], List[str]] :
+    ''' Cut line at every top-level run of |, & and ; characters (outside
+    quotes, and not escaped). Redirections such as 2>&1, >&2, &> and >|
+    stay in their command. Returns the segments and the runs between
+    them, len(segments) == len(runs) + 1. '''
+    segments:List[str] = []
+    runs:List[str] = []
+    current:List[str] = []
+    quote:Optional[str] = None
+    i = 0
+    while i < len(line) :
+        ch = line[i]
+        if quote is not None :
+            # only double quotes know escapes
+            if ch == '\\' and quote == '"' :
+                current.append(line[i:i+2])
+                i += 2
+                continue
+            if ch == quote :
+                quote = None
+        elif ch == '\\' :
+            current.append(line[i:i+2])
+            i += 2
+            continue
+        elif ch in '\'"' :
+            quote = ch
+        elif ch in '|&' and i and line[i - 1] in '<>' or line[i:i+2] == '&>' :
+            # part of a redirection
+            pass
+        elif ch in '|&;' :
+            j = i
+            while j < len(line) and line[j] in '|&;' :
+                j += 1
+            segments.append(''.join(current))
+            runs.append(line[i:j])
+            current = []
+            i = j
+            continue
+        current.append(ch)
+        i += 1
+    segments.append(''.join(current))
+    return segments, runs
+
+def repair(run:str) -> Tuple[str, int] :
+    ''' The separator closest to run and its edit distance. Ties go to the
+    separators starting like run, then to the order of SEPARATORS. A lone
+    & runs a command in the background, and is kept as it is. '''
+    if run == '&' :
+        return run, 0
+    return min(((sep, distance(run, sep)) for sep in SEPARATORS),
+        key=lambda item : (item[1], item[0][0] != run[0], SEPARATORS.index(item[0])))
+
+class PipelineFix :
+    ''' Fix a line of commands joined by |, ||, && and ; one command at a
+    time.
+
+    Each segment is corrected on its own against the grammar, and each
+    separator is repaired to the closest valid one; the cost is the sum of
+    all of them, so it fails if any segment does. A trailing ; or & after
+    the last command is kept as it is.
+
+    Segments are fixed in this process, unless an executor from
+    batch.worker_pool is given and several of them are invalid: a search
+    is then worth a round trip to another process, while checking a valid
+    segment is not.
+    '''
+    def __init__(self, grammar:Union[RegEx, Automaton], line:str, max_cost:int=4,
+            executor:'Executor'=None) :
+        self.segments, runs = split(line)
+        self.separators:List[str] = []
+        cost = 0
+        for run in runs :
+            sep, c = repair(run)
+            self.separators.append(sep)
+            cost += c
+        trailing = len(self.segments) > 1 and not self.segments[-1].strip() \
+            and self.separators[-1] in (';', '&')
+        tail = self.segments.pop() if trailing else None
+        automaton = Automaton.of(grammar)
+        self.results:List[Tuple[Optional[str], int]] = [
+            (segment, 0) if automaton.matches(segment) else None for segment in self.segments]
+        invalid = [i for i, result in enumerate(self.results) if result is None]
+        if executor is not None and len(invalid) > 1 :
+            futures = [executor.submit(_correct_chunk, [self.segments[i]], max_cost)
+                for i in invalid]
+            for i, future in zip(invalid, futures) :
+                self.results[i] = future.result()[0]
+        else :
+            for i in invalid :
+                self.results[i] = correct(automaton, self.segments[i], max_cost)
+        if trailing :
+            self.results.append((tail, 0))
+        for _, c in self.results :
+            cost = -1 if c < 0 or cost < 0 else cost + c
+        self.cost:int = cost
+
+    @property
+    def success(self) -> bool :
+        return self.cost >= 0
+
+    def fix(self) -> Optional[str] :
+        if not self.success :
+            return None
+        ret = [self.results[0][0]]
+        for sep, (fix, _) in zip(self.separators, self.results[1:]) :
+            ret.append(sep)
+            ret.append(fix)
+        return ''.join(ret)
@@ -1,10 +1,13 @@
 from abc import ABC, abstractproperty
-from typing import Set, List, Iterable
+from typing import TYPE_CHECKING, Dict, Iterable, List, Set, Tuple
 from .memoize import *
-from graphviz import Digraph
+if TYPE_CHECKING :
+    from graphviz import Digraph
 
 class _Graphviz_Drawer :
     def __init__(self, name:str='') :
+        # graphviz is slow to import and only needed here
+        from graphviz import Digraph
         self.graph = Digraph(name=name)
         self.graph.attr(ordering='out')
         self.statemap:Dict['Term', int] = dict()
@@ -29,15 +32,52 @@ class Term(ABC) :
     def _export_graphviz(self, drawer:_Graphviz_Drawer) :
         pass
 
+class _Follow :
+    ''' A follow set kept as a chain of groups of terms, each contributing its
+    first set. Leaves extended by the same groups share one chain, which is
+    expanded into leaves only once, on demand. '''
+    def __init__(self, group:Tuple[Term, ...], parent:'_Follow') :
+        self.group = group
+        self.parent = parent
+        self._leaves:Set['Leaf'] = None
+
+    @property
+    def leaves(self) -> Set['Leaf'] :
+        if self._leaves is None :
+            ret = set()
+            chain = self
+            while chain is not None :
+                for term in chain.group :
+                    ret |= term.first
+                chain = chain.parent
+            self._leaves = frozenset(ret)
+        return self._leaves
+
+def _extend_follow(leaves:Iterable['Leaf'], group:Tuple[Term, ...]) :
+    # leaves sharing a chain before keep sharing one after
+    extended:Dict[_Follow, _Follow] = dict()
+    for leaf in leaves :
+        chain = leaf.follow_chain
+        if chain not in extended :
+            extended[chain] = _Follow(group, chain)
+        leaf.follow_chain = extended[chain]
+
 class Leaf(Term) :
     def __init__(self, char:str) :
         assert len(char) == 1
         self.char = char
-        self.follow:Set['Leaf'] = frozenset()
+        self.chars:Set[str] = frozenset(char)
+        self.follow_chain:_Follow = None
     
     def __hash__(self) :
         return id(self)
 
+    @property
+    def follow(self) -> Set['Leaf'] :
+        if self.follow_chain is None :
+            return frozenset()
+        return self.follow_chain.leaves
+
     @memoize_property
     def nullable(self) -> bool:
         return False
@@ -54,6 +94,9 @@ class Leaf(Term) :
     def is_terminator(self) -> bool :
         return False
 
+    def matches(self, char:str) -> bool :
+        return char in self.chars
+
     def _export_graphviz(self, drawer:_Graphviz_Drawer) :
         identifier = len(drawer.statemap) + 1
         drawer.statemap[self] = identifier
@@ -63,10 +106,42 @@ class Leaf(Term) :
     def __repr__(self) -> str:
         return self.char
 
+class ClassLeaf(Leaf) :
+    ''' One position matching any character of chars. Any of them may be
+    inserted or substituted for the class; char, the least one, is the one
+    used where a single character has to be picked. '''
+    def __init__(self, chars:Iterable[str]) :
+        self.chars:Set[str] = frozenset(chars)
+        assert self.chars and all(len(ch) == 1 for ch in self.chars)
+        self.char = min(self.chars)
+        self.follow_chain:_Follow = None
+
+    def _export_graphviz(self, drawer:_Graphviz_Drawer) :
+        identifier = len(drawer.statemap) + 1
+        drawer.statemap[self] = identifier
+        drawer.graph.node(str(identifier), label=repr(self), shape='plain')
+        return identifier
+
+    def __repr__(self) -> str:
+        # runs of consecutive characters are shown as ranges
+        ret = []
+        chars = sorted(self.chars)
+        i = 0
+        while i < len(chars) :
+            j = i
+            while j + 1 < len(chars) and ord(chars[j + 1]) == ord(chars[j]) + 1 :
+                j += 1
+            ret.append(chars[i] if j - i < 2 else f'{chars[i]}-{chars[j]}')
+            if j - i == 1 :
+                ret.append(chars[j])
+            i = j + 1
+        return f'[{"".join(ret)}]'
+
 class _Terminator(Leaf) :
     def __init__(self) :
         self.char = ''
-        self.follow:Set[Leaf] = frozenset()
+        self.chars:Set[str] = frozenset()
+        self.follow_chain:_Follow = None
 
     @memoize_property
     def is_terminator(self) -> bool :
@@ -130,29 +205,21 @@ class Concat(Term) :
     def __init__(self, *terms) :
         self.terms:List[Term] = list(terms)
         
-        # update follow
-        lasts = []
+        # update follow: the last leaves of terms[:i] are followed by the
+        # first leaves of terms[i], and of the nullable terms after it
         last = set()
-        for t in terms :
+        for i in range(1, len(self.terms)) :
+            t = self.terms[i-1]
             if t.nullable :
                 last |= t.last
             else :
-                last = t.last
-            lasts.append(frozenset(last))
-
-        firsts = []
-        first = set()
-        for t in reversed(terms) :
-            if t.nullable :
-                first |= t.first
-            else :
-                first = t.first
-            firsts.append(frozenset(first))
-        firsts = list(reversed(firsts))
-
-        for i in range(1, len(self.terms)) :
-            for leaf in lasts[i-1] :
-                leaf.follow |= firsts[i]
+                last = set(t.last)
+            group = []
+            for u in self.terms[i:] :
+                group.append(u)
+                if not u.nullable :
+                    break
+            _extend_follow(last, tuple(group))
     
     @memoize_property
     def nullable(self) -> bool :
@@ -231,8 +298,7 @@ class KleeneClosure(Term) :
         self.term:Term = term
 
         # update follow
-        for leaf in term.last :
-            leaf.follow = frozenset(leaf.follow | term.first)
+        _extend_follow(term.last, (term,))
     
     @memoize_property
     def nullable(self) -> bool :
@@ -261,8 +327,7 @@ class PositiveClosure(Term) :
         self.term:Term = term
         
         # update follow
-        for leaf in term.last :
-            leaf.follow = frozenset(leaf.follow | term.first)
+        _extend_follow(term.last, (term,))
     
     @memoize_property
     def nullable(self) -> bool :
@@ -294,7 +359,7 @@ class RegEx :
     def as_term(self) -> Term :
         return self.term.terms[0]
 
-    def export_graphviz(self, name:str='') -> Digraph :
+    def export_graphviz(self, name:str='') -> 'Digraph' :
         drawer = _Graphviz_Drawer(name)
         self.term.terms[0]._export_graphviz(drawer)
         return drawer.graph
@@ -305,5 +370,8 @@ class RegEx :
 def Literal(s: str) -> Concat :
     return Concat(*map(Leaf, s))
 
-def Charset(s: str) -> Union :
-    return Union(*map(Leaf, s))
\ No newline at end of file
+def Charset(s: str) -> Term :
+    return ClassLeaf(s) if s else Union()
+
+def CharRange(first: str, last: str) -> ClassLeaf :
+    return ClassLeaf(map(chr, range(ord(first), ord(last) + 1)))
\ No newline at end of file
@@ -1,115 +1,435 @@
-from collections import deque
-from random import choice
-from typing import List, Dict, Tuple, Deque, Optional
-from .regex import RegEx, Leaf
-
-class SearchState :
-    def __init__(self, state:Leaf, pos:int) :
-        self.state = state
-        self.pos = pos
-    
-    def __hash__(self) :
-        return hash((self.state, self.pos))
-    
-    def __eq__(self, another) :
-        return (self.state, self.pos) == (another.state, another.pos)
-
-    def __ne__(self, another) :
-        return not self == another
+import heapq
+import time
+from itertools import islice
+from typing import Callable, FrozenSet, Iterator, List, Dict, Tuple, Optional, Union
+from .regex import RegEx
+from .automaton import Automaton
+from .bitparallel import BitParallel
+
+# A search state (pos, state) is packed into the int pos * len(automaton) + state.
 
 class SearchEdge :
-    def __init__(self, action:str, prev:SearchState) :
+    __slots__ = ('action', 'prev')
+
+    def __init__(self, action:int, prev:int) :
+        # action is the code point emitted along the edge, -1 for none, and
+        # -2 - s for any character of the class of position s
         self.action = action
         self.prev = prev
 
 class SearchNode :
+    __slots__ = ('cost', 'edges')
+
     def __init__(self, cost: int, edges: List[SearchEdge]) :
         self.cost = cost
         self.edges = edges
 
+class SearchStats :
+    ''' Counters of one search, filled in when passed to RegFix. '''
+    def __init__(self) :
+        self.popped:int = 0             # entries popped from the queue
+        self.relaxations:int = 0        # insert/enter/delete moves tried
+        self.pruned_max_cost:int = 0    # moves dropped for exceeding max_cost
+        self.pruned_total_cost:int = 0  # moves dropped for exceeding the best cost found
+        self.dist_size:int = 0          # search states visited
+        self.edges:int = 0              # SearchEdges retained
+        self.search_time:float = 0.0
+        self.fix_time:float = 0.0
+
+    def _prune(self, cost:int, max_cost:int, count:int=1) :
+        if cost > max_cost :
+            self.pruned_max_cost += count
+        else :
+            self.pruned_total_cost += count
+
+    def __repr__(self) -> str :
+        return 'SearchStats(' + ', '.join(f'{k}={v}' for k, v in vars(self).items()) + ')'
+
 class RegFix:
-    def __init__(self, regex:RegEx, errstr:str, max_cost:int=4) :
-        dist:Dict[Leaf, SearchNode] = dict()
+    def __init__(self, regex:Union[RegEx, Automaton], errstr:str, max_cost:int=4,
+            astar:bool=False, stats:SearchStats=None,
+            on_expand:Callable[[int, int, int], None]=None, limit=None) :
+        ''' on_expand(pos, state, cost) is called whenever a search state is expanded.
+        limit is an object whose int .value, read as the search goes, bounds
+        the costs worth finding (e.g. a multiprocessing.RawValue holding the
+        best cost found by other searches); the search fails if it cannot
+        reach the value. '''
+        start_time = time.perf_counter()
+        automaton = Automaton.of(regex)
+        chars, starts, ends, targets = automaton.chars, automaton.starts, automaton.ends, automaton.targets
+        accepts, members, classes = automaton.accepts, automaton.members, automaton.classes
+        n = len(automaton)
+        text = [ord(ch) for ch in errstr]
+        length = len(text)
+        final = length * n
+
+        # A* heuristic for (pos, state): with r input characters left and
+        # between least[state] and most[state] characters still to emit, at
+        # least |emitted - r| more edits are needed; rows[r] is indexed by state
+        if astar :
+            least, most = automaton.remaining
+            rows = [None] * (length + 1)
+            def heuristic(r:int) -> List[int] :
+                if rows[r] is None :
+                    rows[r] = [max(0, l - r, r - m) for l, m in zip(least, most)]
+                return rows[r]
+        else :
+            zeros = [0] * n
+            heuristic = lambda r : zeros
+
+        dist:Dict[int, SearchNode] = dict()
 
-        # 0/1 BFS: using deque
-        deq:Deque[Tuple[SearchState, SearchEdge, bool]] = deque()
+        # buckets[f] holds entries (pos, state, action, prev, cost) whose cost
+        # plus heuristic is f; without A* this is a plain 0/1 BFS
+        buckets:List[List[Tuple[int, int, int, int, int]]] = [[] for _ in range(max_cost + 1)]
 
-        for init_state in regex.term.first :
-            search_state = SearchState(init_state, 0)
-            deq.append((search_state, None, False))
-            dist[search_state] = SearchNode(0, [])
+        for init_state in automaton.initial :
+            h = heuristic(length)[init_state]
+            if h <= max_cost :
+                buckets[h].append((0, init_state, -1, -1, 0))
+                dist[init_state] = SearchNode(0, [])
 
         termini = None
         total_cost:int = 2**63 - 1
-        
-        def update_state(s:SearchState, action:str, last:SearchState, one:bool) :
-            nonlocal total_cost, max_cost
-            term = (s, SearchEdge(action, last), one)
-            cost = dist[last].cost + int(one)
-            if cost > max_cost :
-                return
-            if cost > total_cost : 
-                return
-            if s in dist and dist[s].cost < cost :
-                return
-            if one :
-                deq.append(term)
-            else :
-                deq.appendleft(term)
-
-        def dfs_gen() :
-            nonlocal total_cost, termini
-            while deq :
-                s, edge, one = deq.popleft()
-                if edge is None :
-                    yield s
-                    continue
-                action, last = edge.action, edge.prev
-                cost = dist[last].cost + int(one)
-                if cost > total_cost : 
+        expanded:int = 0
+
+        for f, bucket in enumerate(buckets) :
+            if f > total_cost or limit is not None and f > limit.value :
+                break
+            while bucket :
+                p, s, action, last, cost = bucket.pop()
+                if stats :
+                    stats.popped += 1
+                key = p * n + s
+                if last >= 0 :
+                    node = dist.get(key)
+                    if node is not None :
+                        # already expanded, only record another optimal edge
+                        if node.cost == cost :
+                            node.edges.append(SearchEdge(action, last))
+                        continue
+                    dist[key] = SearchNode(cost, [SearchEdge(action, last)])
+                expanded += 1
+                if on_expand :
+                    on_expand(p, s, cost)
+                if key >= final and accepts[s] and termini is None :
+                    total_cost = cost
+                    termini = key
+
+                bound = min(max_cost, total_cost)
+                if limit is not None :
+                    bound = min(bound, limit.value)
+                # inserts and substitutions may emit any character of a class
+                ch = chars[s] if classes[s] < 0 else -2 - s
+                follow = targets[starts[s]:ends[s]]
+                r = length - p
+                h = heuristic(r)
+                if stats :
+                    stats.relaxations += len(follow) * (2 if r else 1) + (1 if r else 0)
+                # insert
+                base, c = key - s, cost + 1
+                if c <= bound :
+                    for t in follow :
+                        g = c + h[t]
+                        if g <= bound :
+                            node = dist.get(base + t)
+                            if node is None or node.cost >= c :
+                                buckets[g].append((p, t, ch, key, c))
+                        elif stats :
+                            stats._prune(g, max_cost)
+                elif stats :
+                    stats._prune(c, max_cost, len(follow))
+                if p >= length :
                     continue
-                if s in dist :
-                    if dist[s].cost == cost :
-                        dist[s].edges.append(SearchEdge(action, last))
+                # enter: a match emits the input character itself, which
+                # matters for character classes
+                base, h = key - s + n, heuristic(r - 1)
+                if text[p] in members[s] :
+                    c, emit = cost, text[p]
                 else :
-                    dist[s] = SearchNode(cost, [SearchEdge(action, last)])
-                    if s.pos == len(errstr) and s.state.is_terminator :
-                        total_cost = cost
-                        termini = s.state
-                yield s
-
-        for st in dfs_gen() :
-            s, p = st.state, st.pos
-            # insert
-            for next_state in s.follow :
-                update_state(SearchState(next_state, p), s.char, st, True)
-            if p >= len(errstr) : 
-                continue
-            # enter
-            for next_state in s.follow :
-                update_state(SearchState(next_state, p + 1), s.char, st, s.char != errstr[p])
-            # delete
-            update_state(SearchState(s, p + 1), '', st, True)
+                    c, emit = cost + 1, ch
+                if c <= bound :
+                    for t in follow :
+                        g = c + h[t]
+                        if g <= bound :
+                            node = dist.get(base + t)
+                            if node is None or node.cost >= c :
+                                buckets[g].append((p + 1, t, emit, key, c))
+                        elif stats :
+                            stats._prune(g, max_cost)
+                elif stats :
+                    stats._prune(c, max_cost, len(follow))
+                # delete
+                c = cost + 1
+                g = c + h[s]
+                if g <= bound :
+                    node = dist.get(base + s)
+                    if node is None or node.cost >= c :
+                        buckets[g].append((p + 1, s, -1, key, c))
+                elif stats :
+                    stats._prune(g, max_cost)
+
+        # several terminators may tie; pick one independently of search order
+        ends = [final + t for t, accepting in enumerate(accepts)
+            if accepting and final + t in dist and dist[final + t].cost == total_cost]
+        if termini is not None :
+            termini = min(ends)
 
         self.errstr:str = errstr
+        self.automaton:Automaton = automaton
+        self.max_cost:int = max_cost
         self.cost:int = total_cost
-        self.termini:Leaf = termini
-        self.dist:[SearchState, SearchNode] = dist
+        self.termini:Optional[int] = termini
+        self.dist:Dict[int, SearchNode] = dist
+        self.expanded:int = expanded
+        self.stats:Optional[SearchStats] = stats
+        self._ends:FrozenSet[int] = frozenset(ends)
+        self._forward:Dict[int, List[Tuple[int, int]]] = None
+        self._sources:List[int] = None
+        self._rows:Tuple[int, List[List[int]]] = None
         if not self.success :
             self.cost = -1
+        if stats :
+            stats.dist_size = len(dist)
+            stats.edges = sum(len(node.edges) for node in dist.values())
+            stats.search_time += time.perf_counter() - start_time
 
     @property
     def success(self) -> bool:
         return self.termini is not None
-    
+
     def fix(self) -> Optional[str]:
+        ''' The first of fixes(), i.e. the lexicographically least optimal fix. '''
         if self.termini is None: return None
-        s = SearchState(self.termini, len(self.errstr))
-        ret = []
-        while len(self.dist[s].edges) :
-            edge:SearchEdge = choice(self.dist[s].edges)
-            op = edge.action
-            ls = edge.prev
-            ret.append(op)
-            s = ls
-        return ''.join(reversed(ret))
+        start_time = time.perf_counter()
+        ret = next(self.fixes())
+        if self.stats :
+            self.stats.fix_time += time.perf_counter() - start_time
+        return ret
+
+    def fixes(self, k:int=None, max_cost:int=None) -> Iterator[str]:
+        ''' The fixes of ranked(k, max_cost), without their costs. All the
+        optimal fixes are fixes(max_cost=self.cost). '''
+        return (fix for fix, _ in self.ranked(k, max_cost))
+
+    def ranked(self, k:int=None, max_cost:int=None) -> Iterator[Tuple[str, int]]:
+        ''' Lazily yield the k best distinct (fix, cost) pairs, by cost and
+        then lexicographically, with costs up to max_cost (by default that
+        of the search): the optimal fixes first, then the next best.
+        >>> from itertools import product
+        >>> from regfix.regex import *
+        >>> from regfix.names import distance
+        >>> automaton = Automaton.of(RegEx(Concat(
+        ...     KleeneClosure(Union(Literal('ab'), Charset('bc'))), Literal('a'))))
+        >>> words = [''.join(w) for n in range(7) for w in product('abc', repeat=n)]
+        >>> for errstr in ['', 'a', 'cbba', 'acab', 'bbbb'] :
+        ...     fix = RegFix(automaton, errstr, 2)
+        ...     expected = sorted((distance(errstr, w), w) for w in words
+        ...         if automaton.matches(w) and distance(errstr, w) <= 2)
+        ...     assert [(c, w) for w, c in fix.ranked()] == expected
+        ...     assert fix.count_fixes() == sum(c == fix.cost for c, _ in expected)
+        '''
+        max_cost = self.max_cost if max_cost is None else max_cost
+        def generate() :
+            if self.termini is not None :
+                for fix in self._optimal() :
+                    yield fix, self.cost
+            first = self.cost + 1 if self.termini is not None else self.max_cost + 1
+            for cost in range(first, max_cost + 1) :
+                for fix in self._exactly(cost) :
+                    yield fix, cost
+        yield from islice(generate(), k)
+
+    def _optimal(self) -> Iterator[str] :
+        # walk the optimal DAG forwards, over sets of search states that have
+        # emitted the same prefix (closed under deletions, which emit nothing)
+        stack = [('', self._start())]
+        while stack :
+            prefix, states = stack.pop()
+            if states & self._ends :
+                yield prefix
+            for ch, nxt in reversed(self._children(states)) :
+                stack.append((prefix + chr(ch), nxt))
+
+    def _exactly(self, cost:int) -> Iterator[str] :
+        # depth-first over the prefixes that can still be completed within
+        # cost, each with the least costs {search state: cost} of emitting it;
+        # a prefix is yielded if its own least cost is exactly cost
+        rows = self._to_end(cost)
+        automaton = self.automaton
+        n, starts, ends, targets = len(automaton), automaton.starts, automaton.ends, automaton.targets
+        accepts, members = automaton.accepts, automaton.members
+        text = [ord(ch) for ch in self.errstr]
+        length = len(text)
+        final = length * n
+
+        def relax(states:Dict[int, int], key:int, c:int) -> bool :
+            if c + rows[key // n][key % n] <= cost and c < states.get(key, cost + 1) :
+                states[key] = c
+                return True
+            return False
+
+        def close(states:Dict[int, int]) -> Dict[int, int] :
+            # deletions, in increasing order of position
+            heap = list(states)
+            heapq.heapify(heap)
+            while heap :
+                key = heapq.heappop(heap)
+                if key < final :
+                    fresh = key + n not in states
+                    if relax(states, key + n, states[key] + 1) and fresh :
+                        heapq.heappush(heap, key + n)
+            return states
+
+        start:Dict[int, int] = dict()
+        for s in automaton.initial :
+            relax(start, s, 0)
+        stack = [('', close(start))]
+        while stack :
+            prefix, states = stack.pop()
+            if min((c for key, c in states.items() if key >= final and accepts[key - final]),
+                    default=-1) == cost :
+                yield prefix
+            by_char:Dict[int, Dict[int, int]] = dict()
+            for key, c in states.items() :
+                p, s = divmod(key, n)
+                follow = targets[starts[s]:ends[s]]
+                if not follow :
+                    continue
+                for ch in members[s] :
+                    nxt = by_char.setdefault(ch, dict())
+                    sub = c + (p >= length or text[p] != ch)
+                    for t in follow :
+                        # insert, then enter
+                        relax(nxt, key - s + t, c + 1)
+                        if p < length :
+                            relax(nxt, key - s + n + t, sub)
+            for ch in sorted(by_char, reverse=True) :
+                if by_char[ch] :
+                    stack.append((prefix + chr(ch), close(by_char[ch])))
+
+    def _to_end(self, bound:int) -> List[List[int]] :
+        # rows[p][s]: the least cost from search state (p, s) to an end, or
+        # bound + 1 if that exceeds bound
+        if self._rows is None or self._rows[0] < bound :
+            automaton = self.automaton
+            n, starts, ends, targets = len(automaton), automaton.starts, automaton.ends, automaton.targets
+            accepts, members = automaton.accepts, automaton.members
+            preceding:List[List[int]] = [[] for _ in range(n)]
+            for s in range(n) :
+                for t in targets[starts[s]:ends[s]] :
+                    preceding[t].append(s)
+            text = [ord(ch) for ch in self.errstr]
+            inf = bound + 1
+            rows:List[List[int]] = [None] * (len(text) + 1)
+            for p in range(len(text), -1, -1) :
+                if p == len(text) :
+                    row = [0 if accepting else inf for accepting in accepts]
+                else :
+                    # delete, or enter
+                    nxt, ch = rows[p + 1], text[p]
+                    row = []
+                    for s in range(n) :
+                        sub = ch not in members[s]
+                        best = nxt[s] + 1
+                        for t in targets[starts[s]:ends[s]] :
+                            best = min(best, nxt[t] + sub)
+                        row.append(min(best, inf))
+                # inserts, by increasing cost
+                buckets:List[List[int]] = [[] for _ in range(inf)]
+                for s, c in enumerate(row) :
+                    if c < inf :
+                        buckets[c].append(s)
+                for c, bucket in enumerate(buckets) :
+                    for t in bucket :
+                        if row[t] != c :
+                            continue
+                        for s in preceding[t] :
+                            if c + 1 < row[s] :
+                                row[s] = c + 1
+                                if c + 1 < inf :
+                                    buckets[c + 1].append(s)
+                rows[p] = row
+            self._rows = (bound, rows)
+        return self._rows[1]
+
+    def count_fixes(self) -> int:
+        ''' The number of distinct optimal fixes, without enumerating them. '''
+        if self.termini is None :
+            return 0
+        # post-order over the state sets, with an explicit stack as lines
+        # may be longer than the recursion limit; a set is counted once all
+        # of its children are
+        memo:Dict[FrozenSet[int], int] = dict()
+        children:Dict[FrozenSet[int], List[FrozenSet[int]]] = dict()
+        start = self._start()
+        stack = [start]
+        while stack :
+            states = stack[-1]
+            if states in memo :
+                stack.pop()
+                continue
+            if states not in children :
+                children[states] = [nxt for _, nxt in self._children(states)]
+            pending = [nxt for nxt in children[states] if nxt not in memo]
+            if pending :
+                stack.extend(pending)
+            else :
+                stack.pop()
+                memo[states] = bool(states & self._ends) + sum(memo[nxt] for nxt in children.pop(states))
+        return memo[start]
+
+    def _start(self) -> FrozenSet[int] :
+        if self._forward is None :
+            # reverse the optimal edges of the states that reach an end
+            self._forward, self._sources = dict(), []
+            seen = set(self._ends)
+            stack = list(self._ends)
+            while stack :
+                s = stack.pop()
+                edges = self.dist[s].edges
+                if not edges :
+                    self._sources.append(s)
+                for edge in edges :
+                    self._forward.setdefault(edge.prev, []).append((edge.action, s))
+                    if edge.prev not in seen :
+                        seen.add(edge.prev)
+                        stack.append(edge.prev)
+        return self._close(self._sources)
+
+    def _close(self, states:List[int]) -> FrozenSet[int] :
+        ret = set(states)
+        stack = list(states)
+        while stack :
+            for action, nxt in self._forward.get(stack.pop(), ()) :
+                if action == -1 and nxt not in ret :
+                    ret.add(nxt)
+                    stack.append(nxt)
+        return frozenset(ret)
+
+    def _children(self, states:FrozenSet[int]) -> List[Tuple[int, FrozenSet[int]]] :
+        # successor state sets, by emitted character
+        members = self.automaton.members
+        by_char:Dict[int, List[int]] = dict()
+        for s in states :
+            for action, nxt in self._forward.get(s, ()) :
+                if action >= 0 :
+                    by_char.setdefault(action, []).append(nxt)
+                elif action < -1 :
+                    for ch in members[-2 - action] :
+                        by_char.setdefault(ch, []).append(nxt)
+        return [(ch, self._close(by_char[ch])) for ch in sorted(by_char)]
+
+def correct(regex:Union[RegEx, Automaton], errstr:str, max_cost:int=4) -> Tuple[Optional[str], int] :
+    ''' (fix, cost) as RegFix finds them, or (None, -1). A valid errstr is
+    only run through the automaton; otherwise BitParallel computes the cost
+    first, and RegFix searches for the fix within exactly that bound, so
+    that its work follows the actual cost rather than max_cost. '''
+    automaton = Automaton.of(regex)
+    if automaton.matches(errstr) :
+        return errstr, 0
+    cost = BitParallel.of(automaton).cost(errstr, max_cost)
+    if cost < 0 :
+        return None, -1
+    fix = RegFix(automaton, errstr, cost)
+    return fix.fix(), fix.cost
@@ -0,0 +1,153 @@
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import tempfile
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+from .automaton import Automaton
+from .cfg import CFGFix, Grammar
+from .regex import RegEx
+from .regfix import correct
+if TYPE_CHECKING :
+    from .parallel import ParallelFixer
+    from .cache import FixCache
+
+# the socket lives in a directory only its owner can enter, so other users
+# can neither replace it nor connect to it
+_RUNTIME_DIR:str = os.environ.get('XDG_RUNTIME_DIR') or \
+    os.path.join(tempfile.gettempdir(), f'regfix-{os.getuid()}')
+DEFAULT_SOCKET:str = os.environ.get('REGFIX_SOCKET',
+    os.path.join(_RUNTIME_DIR, 'regfix.sock'))
+
+def _private_dir(path:str) :
+    ''' Create directory path for the socket, or make sure that the one
+    already there is ours and closed to everybody else. '''
+    os.makedirs(path, 0o700, exist_ok=True)
+    st = os.lstat(path)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077 :
+        raise PermissionError(f'{path} is not a private directory of this user')
+
+def _peer_uid(sock:socket.socket) -> int :
+    if hasattr(socket, 'SO_PEERCRED') :
+        # struct ucred { pid_t pid; uid_t uid; gid_t gid; }
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        return struct.unpack('3i', creds)[1]
+    return os.stat(sock.getpeername()).st_uid
+
+# Protocol: one request per line.
+#   plain: `<errstr>\n`                           -> `<fix>\n<cost>\n`
+#   json:  `{"errstr": ..., "max_cost": ..., "dir": ...}\n`
+#                                                 -> `{"fix": ..., "cost": ...}\n`
+# A json request names the directory whose files it was fixed against, if
+# any; a server of another directory (or none) answers `{"error": ...}\n`,
+# as it does to a json request with fields of the wrong type, or max_cost
+# outside [0, MAX_COST].
+
+MAX_COST:int = 16
+
+class _Handler(socketserver.StreamRequestHandler) :
+    def handle(self) :
+        for line in self.rfile :
+            line = line.decode(errors='replace').rstrip('\n')
+            try :
+                request = _parse_json(line)
+            except ValueError as e :
+                reply = json.dumps({'error': str(e)}) + '\n'
+            else :
+                if request is None :
+                    fix, cost = self.server.correct(line)
+                    reply = f'{fix}\n{cost}\n'
+                elif request.get('dir') != self.server.directory :
+                    reply = json.dumps({'error': 'serving another directory'}) + '\n'
+                else :
+                    fix, cost = self.server.correct(request['errstr'], request.get('max_cost', 4))
+                    reply = json.dumps({'fix': fix, 'cost': cost}) + '\n'
+            self.wfile.write(reply.encode())
+            self.wfile.flush()
+
+def _parse_json(line:str) -> Optional[dict] :
+    ''' The json request on line, or None for a plain one. Raises
+    ValueError if its fields are not valid. '''
+    if not line.startswith('{') :
+        return None
+    try :
+        request = json.loads(line)
+    except ValueError :
+        return None
+    if not isinstance(request, dict) or 'errstr' not in request :
+        return None
+    if not isinstance(request['errstr'], str) :
+        raise ValueError('errstr must be a string')
+    max_cost = request.get('max_cost', 4)
+    if type(max_cost) is not int or not 0 <= max_cost <= MAX_COST :
+        raise ValueError(f'max_cost must be an integer in [0, {MAX_COST}]')
+    if not isinstance(request.get('dir', ''), str) :
+        raise ValueError('dir must be a string')
+    return request
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer) :
+    daemon_threads = True
+
+    def __init__(self, regex:Union[RegEx, Automaton, Grammar, 'ParallelFixer'], path:str=DEFAULT_SOCKET,
+            cache:'FixCache'=None, directory:str=None) :
+        ''' directory is the one whose files the oracle of a Grammar names. '''
+        self.regex = regex
+        self.cache = cache
+        self.directory = None if directory is None else os.path.realpath(directory)
+        if os.path.dirname(path) == _RUNTIME_DIR :
+            _private_dir(_RUNTIME_DIR)
+        if os.path.exists(path) :
+            os.unlink(path)
+        super().__init__(path, _Handler)
+
+    def correct(self, errstr:str, max_cost:int=4) -> Tuple[Optional[str], int] :
+        if self.cache is not None :
+            return self.cache.lookup(errstr, max_cost, lambda : self._correct(errstr, max_cost))
+        return self._correct(errstr, max_cost)
+
+    def _correct(self, errstr:str, max_cost:int) -> Tuple[Optional[str], int] :
+        if isinstance(self.regex, (RegEx, Automaton)) :
+            return correct(self.regex, errstr, max_cost)
+        if isinstance(self.regex, Grammar) :
+            fix = CFGFix(self.regex, errstr, max_cost)
+            return fix.fix(), fix.cost
+        return self.regex.fix(errstr, max_cost)
+
+    def server_close(self) :
+        super().server_close()
+        if os.path.exists(self.server_address) :
+            os.unlink(self.server_address)
+
+def serve(regex:Union[RegEx, Automaton, Grammar, 'ParallelFixer'], path:str=DEFAULT_SOCKET,
+        cache:'FixCache'=None, directory:str=None) :
+    signal.signal(signal.SIGTERM, lambda *_ : exit())
+    with Server(regex, path, cache, directory) as server :
+        try :
+            server.serve_forever()
+        except KeyboardInterrupt :
+            pass
+
+def request(errstr:str, max_cost:int=4, path:str=DEFAULT_SOCKET,
+        timeout:float=1.0, directory:str=None) -> Optional[Tuple[Optional[str], int]] :
+    ''' Ask a running server for a fix, against the files of directory if
+    given. Returns None if no server of this user is listening for that
+    directory, or if it fails to answer properly within timeout. '''
+    message = {'errstr': errstr, 'max_cost': max_cost}
+    if directory is not None :
+        message['dir'] = os.path.realpath(directory)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try :
+        with sock :
+            sock.connect(path)
+            if _peer_uid(sock) != os.getuid() :
+                return None
+            with sock.makefile('rwb') as stream :
+                stream.write((json.dumps(message) + '\n').encode())
+                stream.flush()
+                reply = json.loads(stream.readline())
+            return reply['fix'], reply['cost']
+    except (OSError, ValueError, KeyError, TypeError) :
+        return None
@@ -1,4 +1,6 @@
 from dsl import *
+from regfix.cfg import Grammar
+from regfix.dispatch import CommandIndex
 
 rules: List[Command] = [
     # apt-get
@@ -22,12 +24,12 @@ rules: List[Command] = [
 
     # cat
     Command('cat', [
-        Argument(FILES, '+')
+        Argument(FILES, '+', exists=True)
     ]),
 
     # cd
     Command('cd', [
-        Argument(PATH)
+        Argument(PATH, exists='dir')
     ]),
 
     # chmod
@@ -93,7 +95,7 @@ rules: List[Command] = [
 
     # rmdir
     Command('rmdir', [
-        Argument(PATHS, '+')
+        Argument(PATHS, '+', exists='dir')
     ]),
 
     # sort
@@ -102,11 +104,26 @@ rules: List[Command] = [
     # tail
     Command('tail', [
         Argument(Concat(Leaf('-'), NUMBER), '?'),
-        Argument(PATH)
+        Argument(PATH, exists=True)
     ]),
 
     # touch
     Command('touch', [
         Argument(PATHS, '+')
     ])
-]
\ No newline at end of file
+]
+
+def get_regex() -> RegEx :
+    return RegEx(Union(*(rule.get_regex().as_term() for rule in rules)))
+
+def get_index() -> CommandIndex :
+    # each command is compiled when it is first searched
+    return CommandIndex((rule.name, rule.get_regex) for rule in rules)
+
+def get_grammar(oracle=None) -> Grammar :
+    ''' With an oracle (e.g. regfix.names.FileOracle), arguments naming
+    existing files are matched against it. '''
+    grammar = Grammar()
+    for rule in rules :
+        grammar.add(rule.get_symbol(grammar, oracle), rule.name)
+    return grammar
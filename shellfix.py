@@ -1,14 +1,103 @@
 #!/usr/bin/env python3
 
-from regfix.dfa import DFA
-import regfix.regex
-import regfix
-import rules
+import argparse
+import fileinput
+import json
+import sys
+import time
+from typing import Iterable, Iterator
+import grammar
+import regfix.server
 
-total_regex = regfix.regex.Union(*(rule.get_regex().as_term() for rule in rules.rules))
-reg = regfix.regex.RegEx(total_regex)
+parser = argparse.ArgumentParser(description='Fix a shell command line.')
+parser.add_argument('--serve', action='store_true',
+    help='compile the rules once and serve fixes on a unix socket')
+parser.add_argument('--socket', default=regfix.server.DEFAULT_SOCKET,
+    help='unix socket path of the server')
+parser.add_argument('--no-server', action='store_true',
+    help='do not try to reach a running server')
+parser.add_argument('--workers', type=int, default=0,
+    help='with --serve, search the commands in parallel in this many processes')
+parser.add_argument('--jsonl', action='store_true',
+    help='fix every line of the files (default: stdin), writing one JSON object per line')
+parser.add_argument('--pipeline', action='store_true',
+    help='fix the commands joined by |, ||, && and ; one by one')
+parser.add_argument('--cache', default=None,
+    help='SQLite file keeping fixes across runs, invalidated when the rules change')
+parser.add_argument('--dir', default=None,
+    help='correct file arguments to the names of the files in DIR; with --serve, serve for DIR')
+parser.add_argument('files', nargs='*', help='input files of --jsonl')
+args = parser.parse_args()
+if args.files and not args.jsonl :
+    parser.error('input files need --jsonl')
+if args.dir is not None and args.workers :
+    parser.error('--workers cannot be combined with --dir')
+
+def stream(lines:Iterable[str]) -> Iterator[dict] :
+    # one line at a time, so memory does not grow with the input
+    automaton = grammar.load()
+    for line in lines :
+        start = time.perf_counter()
+        fix = regfix.RegFix(automaton, line)
+        result = fix.fix()
+        yield {'fix' : result, 'cost' : fix.cost,
+            'elapsed' : time.perf_counter() - start, 'states' : fix.expanded}
+
+cache = None
+# the cache is keyed by the rules only, so it knows nothing of the files
+if (args.serve or args.cache) and args.dir is None :
+    import regfix.cache
+    cache = regfix.cache.FixCache(grammar.fingerprint(), path=args.cache)
+
+if args.serve :
+    try :
+        if args.dir is not None :
+            # one oracle for the server's lifetime: the directory is scanned
+            # before serving, then only again when it changes
+            import rules
+            from regfix.names import FileOracle
+            oracle = FileOracle(args.dir)
+            oracle.index
+            regfix.server.serve(rules.get_grammar(oracle), args.socket, directory=args.dir)
+        elif args.workers :
+            import regfix.parallel
+            with regfix.parallel.ParallelFixer(grammar.load_index(), args.workers) as fixer :
+                regfix.server.serve(fixer, args.socket, cache)
+        else :
+            regfix.server.serve(grammar.load(), args.socket, cache)
+    finally :
+        if cache is not None :
+            print('cache', json.dumps(cache.stats()), file=sys.stderr)
+    exit()
+
+if args.jsonl :
+    lines = (line.rstrip('\n') for line in fileinput.input(args.files))
+    for record in stream(lines) :
+        print(json.dumps(record), flush=True)
+    exit()
 
 err = input()
-fix = regfix.RegFix(reg, err)
-print(fix.fix())
-print(fix.cost)
\ No newline at end of file
+# the server fixes whole lines, so it cannot take --pipeline
+reply = None if args.no_server or args.pipeline else \
+    regfix.server.request(err, path=args.socket, directory=args.dir)
+if reply is None :
+    def compute() :
+        if args.dir is not None :
+            # file names are not part of the rules, so the regex engines
+            # cannot see them; the CFG engine asks the directory instead
+            import rules
+            from regfix.cfg import CFGFix
+            from regfix.names import FileOracle
+            fix = CFGFix(rules.get_grammar(FileOracle(args.dir)), err)
+            return fix.fix(), fix.cost
+        if args.pipeline :
+            import regfix.pipeline
+            fix = regfix.pipeline.PipelineFix(grammar.load(), err)
+            return fix.fix(), fix.cost
+        # only the commands whose names are close enough get searched
+        import regfix.dispatch
+        fix = regfix.dispatch.IndexedFix(grammar.load_index(), err)
+        return fix.fix(), fix.cost
+    reply = compute() if cache is None or args.pipeline else cache.lookup(err, 4, compute)
+print(reply[0])
+print(reply[1])
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import regfix
 from regfix.dfa import DFA
+from regfix.dense import DenseFix
 from regfix.regex import *
 
 # KleeneClosure(Union(Literal('foo'), Literal('bar')))
@@ -9,6 +10,6 @@ print(str(regex))
 open('reg.gv', 'w').write(regex.export_graphviz('RegEx').source)
 dfa = DFA(regex, 'abcdefghijklmnopqrstuvwxyz')
 open('graph.gv', 'w').write(dfa.export_graphviz('DFA').source)
-fix = regfix.RegFix(dfa, 'bababbabababaaab')
+fix = DenseFix(dfa, 'bababbabababaaab', max_cost=8)
 print(fix.cost)
 print(fix.fix())
\ No newline at end of file